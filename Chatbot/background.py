@@ -0,0 +1,56 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable
+
+class PeriodicTask:
+    """Run a coroutine function every interval seconds in the background, logging its failures"""
+
+    def __init__(self, action: Callable[[], Awaitable], interval: float, description: str, delay_first: bool = False):
+        self.action = action
+        self.interval = interval
+        # Used in the error message, e.g. "refreshing gazetteer"
+        self.description = description
+        # Wait one interval before the first run instead of running straight away
+        self.delay_first = delay_first
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        if self.delay_first:
+            await asyncio.sleep(self.interval)
+        while True:
+            try:
+                await self.action()
+            except Exception as e:
+                print(f"Error {self.description}: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the loop if it is not running yet"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the loop and wait for it to finish"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+class BlockingIO:
+    """Small dedicated thread pool for blocking calls, so they stay off the event loop and the default executor"""
+
+    def __init__(self, threads: int, name: str):
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=name)
+
+    async def run(self, function, *args):
+        """Call function(*args) on the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(function, *args))
+
+    def shutdown(self):
+        """Wait for pending calls and stop the threads"""
+        self._executor.shutdown(wait=True)
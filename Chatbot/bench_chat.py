@@ -0,0 +1,331 @@
+import os
+import argparse
+import asyncio
+import json
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+# Keep benchmark state out of the real stores; config reads these when chatbot is imported
+BENCH_DIR = tempfile.mkdtemp(prefix='chat-bench-')
+os.environ['CONVERSATION_DB_PATH'] = os.path.join(BENCH_DIR, 'conversations.sqlite3')
+os.environ['SHARED_STORE_PATH'] = os.path.join(BENCH_DIR, 'shared_cache.sqlite3')
+os.environ['CONVERSATION_BACKEND'] = 'sqlite'
+os.environ['SHARED_STORE_BACKEND'] = 'sqlite'
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+
+import aiomysql
+from pydantic_ai.messages import ModelMessagesTypeAdapter, ToolReturnPart, UserPromptPart
+from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+
+import chatbot
+import db_pool
+from bench_stats import percentile
+from config import DB_POOL_MAX_SIZE
+
+# Seeded places the simulated users ask about: (name, latitude, longitude)
+BENCH_PLACES = [
+    ('Hà Nội', 21.0285, 105.8542), ('Hồ Chí Minh', 10.8231, 106.6297), ('Đà Nẵng', 16.0544, 108.2022),
+    ('Huế', 16.4637, 107.5909), ('Hải Phòng', 20.8449, 106.6881), ('Cần Thơ', 10.0452, 105.7469),
+    ('Nha Trang', 12.2388, 109.1967), ('Đà Lạt', 11.9404, 108.4583), ('Vũng Tàu', 10.3460, 107.0843),
+    ('Quy Nhơn', 13.7830, 109.2197), ('Hạ Long', 20.9517, 107.0800), ('Sa Pa', 22.3364, 103.8438),
+]
+
+BENCH_SCHEMA = '''
+    CREATE TABLE location(
+        id INTEGER PRIMARY KEY, name TEXT NOT NULL, latitude REAL, longitude REAL,
+        name_normalized TEXT GENERATED ALWAYS AS (LOWER(TRIM(name))) STORED
+    );
+    CREATE INDEX idx_location_coordinates ON location(latitude, longitude);
+    CREATE TABLE weather_data(
+        id INTEGER PRIMARY KEY, location_id INTEGER NOT NULL, temperature REAL, feelsLike REAL, humidity INTEGER,
+        windSpeed REAL, icon TEXT, description TEXT, main TEXT, updatedAt TEXT
+    );
+    CREATE TABLE hourly_data(
+        id INTEGER PRIMARY KEY, location_id INTEGER NOT NULL, time INTEGER,
+        temperatureMax REAL, temperatureMin REAL, humidity INTEGER, icon TEXT
+    );
+    CREATE TABLE daily_data(
+        id INTEGER PRIMARY KEY, location_id INTEGER NOT NULL, time INTEGER,
+        temperatureMax REAL, temperatureMin REAL, humidity INTEGER, icon TEXT
+    );
+    CREATE TABLE search_history(
+        location TEXT NOT NULL, searched_at TEXT NOT NULL, lat REAL NOT NULL, lon REAL NOT NULL,
+        location_normalized TEXT GENERATED ALWAYS AS (LOWER(TRIM(location))) STORED
+    );
+    CREATE TABLE data_generation(location_id INTEGER PRIMARY KEY, generation INTEGER NOT NULL);
+    INSERT INTO data_generation (location_id, generation) VALUES (0, 1);
+'''
+
+def seed_weather_db(path: str):
+    """Create the chatbot's read tables in SQLite with current weather and forecasts for BENCH_PLACES"""
+    connection = sqlite3.connect(path)
+    connection.executescript(BENCH_SCHEMA)
+    now = int(time.time())
+    for location_id, (name, latitude, longitude) in enumerate(BENCH_PLACES, start=1):
+        connection.execute("INSERT INTO location (id, name, latitude, longitude) VALUES (?, ?, ?, ?)",
+                           (location_id, name, latitude, longitude))
+        connection.execute('''
+            INSERT INTO weather_data (location_id, temperature, feelsLike, humidity, windSpeed, icon, description, main, updatedAt)
+            VALUES (?, 29.5, 33.0, 75, 3.4, '10d', 'mưa nhẹ', 'Rain', ?)
+        ''', (location_id, time.strftime('%Y-%m-%dT%H:%M:%S')))
+        for table, step, rows in (('hourly_data', 3600, 24), ('daily_data', 86400, 7)):
+            connection.executemany(
+                f"INSERT INTO {table} (location_id, time, temperatureMax, temperatureMin, humidity, icon) VALUES (?, ?, ?, ?, ?, ?)",
+                [(location_id, now + i * step, 31 + i % 3, 25 + i % 2, 70 + i % 10, '10d') for i in range(rows)]
+            )
+        connection.execute("INSERT INTO data_generation (location_id, generation) VALUES (?, 1)", (location_id,))
+    connection.commit()
+    connection.close()
+
+class SqliteCursor:
+    """aiomysql-style cursor over SQLite; queries run on a thread like network round-trips would"""
+
+    def __init__(self, connection: sqlite3.Connection, dictionary: bool):
+        self._cursor = connection.cursor()
+        self._dictionary = dictionary
+        self.description = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self._cursor.close()
+
+    async def execute(self, statement: str, params=()):
+        try:
+            await asyncio.to_thread(self._cursor.execute, statement.replace('%s', '?'), tuple(params))
+        except sqlite3.Error as e:
+            # Callers handle aiomysql errors, so surface SQLite failures the same way
+            raise aiomysql.OperationalError(str(e))
+        self.description = self._cursor.description
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self.description, row)}
+
+    async def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    async def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+class SqliteConnection:
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.create_function('POW', 2, pow)
+
+    def cursor(self, cursor_class=aiomysql.Cursor) -> SqliteCursor:
+        return SqliteCursor(self._connection, issubclass(cursor_class, aiomysql.DictCursor))
+
+    def close(self):
+        pass
+
+class SqlitePool:
+    """Stand-in for the aiomysql pool: a fixed set of connections that callers wait for"""
+
+    def __init__(self, path: str, size: int):
+        self._free: asyncio.Queue[SqliteConnection] = asyncio.Queue()
+        for _ in range(size):
+            self._free.put_nowait(SqliteConnection(path))
+
+    async def acquire(self) -> SqliteConnection:
+        return await self._free.get()
+
+    def release(self, connection: SqliteConnection):
+        self._free.put_nowait(connection)
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+@dataclass
+class RequestResult:
+    ttft: float
+    latency: float
+    tokens: int
+
+@dataclass
+class RoundStats:
+    results: list[RequestResult] = field(default_factory=list)
+    errors: int = 0
+
+def stub_model(tokens: int, tokens_per_second: float, first_token_delay: float, tool_calls: list[str]) -> FunctionModel:
+    """Model that looks up the place in the question with the weather tools, then streams a fixed
+    number of tokens at a steady rate; every tool call is appended to tool_calls"""
+    interval = 1 / tokens_per_second if tokens_per_second > 0 else 0
+
+    def call(index: int, name: str, **args) -> dict[int, DeltaToolCall]:
+        tool_calls.append(name)
+        return {index: DeltaToolCall(name=name, json_args=json.dumps(args), tool_call_id=f"{name}-{index}")}
+
+    async def stream(messages, info):
+        await asyncio.sleep(first_token_delay)
+        parts = messages[-1].parts
+        returned = {part.tool_name: part.content for part in parts if isinstance(part, ToolReturnPart)}
+        prompt = next((part.content for part in parts if isinstance(part, UserPromptPart)), None)
+        if prompt is not None:
+            place = next((name for name, _, _ in BENCH_PLACES if name in prompt), None)
+            if place is not None:
+                yield call(0, 'get_latitute_longtitue', location=place)
+                return
+        coordinates = returned.get('get_latitute_longtitue')
+        if coordinates:
+            latitude, longitude = coordinates
+            yield {**call(0, 'get_current_weather', latitude=latitude, longtitude=longitude),
+                   **call(1, 'get_daily_forecast', latitude=latitude, longtitude=longitude)}
+            return
+        for i in range(tokens):
+            if i and interval:
+                await asyncio.sleep(interval)
+            yield f"tok{i} "
+
+    return FunctionModel(stream_function=stream)
+
+async def send_message(uid: str, message: str) -> RequestResult:
+    """Drive chat_endpoint and time the streamed body"""
+    start = time.perf_counter()
+    response = await chatbot.chat_endpoint(chatbot.MessageRequest(uid=uid, message=message))
+    ttft = None
+    tokens = 0
+    async for chunk in response.body_iterator:
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        # pydantic-ai batches deltas, so count the stub's one-word tokens rather than chunks
+        tokens += len(chunk.split())
+    latency = time.perf_counter() - start
+    return RequestResult(ttft if ttft is not None else latency, latency, tokens)
+
+async def simulate_user(uid: int, turns: int, think_time: float, stats: RoundStats):
+    for turn in range(turns):
+        # Not a fast-path template, so every question goes through the model and its weather tools
+        place = BENCH_PLACES[(uid + turn) % len(BENCH_PLACES)][0]
+        message = f"Chiều nay có nên đi dạo ở {place} không, lượt {turn}"
+        try:
+            stats.results.append(await send_message(f"bench-user-{uid}", message))
+        except Exception as e:
+            print(f"Request failed for user {uid}: {e}")
+            stats.errors += 1
+        if think_time:
+            await asyncio.sleep(think_time)
+
+def history_footprint() -> dict:
+    """Size of the conversation histories the chatbot keeps in memory"""
+    cached = chatbot.conversation_store._memory.values()
+    return {
+        'conversations': len(chatbot.conversation_store),
+        'messages': sum(len(c.messages) for c in cached),
+        'serialized_bytes': sum(len(ModelMessagesTypeAdapter.dump_json(c.messages)) for c in cached),
+    }
+
+def summarize(stats: RoundStats, elapsed: float) -> dict:
+    ttfts = [r.ttft * 1000 for r in stats.results]
+    latencies = [r.latency * 1000 for r in stats.results]
+    total_tokens = sum(r.tokens for r in stats.results)
+    streaming_time = sum(r.latency - r.ttft for r in stats.results)
+    return {
+        'requests': len(stats.results),
+        'errors': stats.errors,
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(len(stats.results) / elapsed, 2) if elapsed else 0.0,
+        'ttft_ms': {f'p{p}': round(percentile(ttfts, p), 2) for p in (50, 95, 99)},
+        'latency_ms': {f'p{p}': round(percentile(latencies, p), 2) for p in (50, 95, 99)},
+        'tokens_per_s': round(total_tokens / streaming_time, 1) if streaming_time else 0.0,
+        'aggregate_tokens_per_s': round(total_tokens / elapsed, 1) if elapsed else 0.0,
+    }
+
+async def run_benchmark(args) -> dict:
+    if args.trace_memory:
+        tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0] if args.trace_memory else 0
+
+    # Weather reads go through the real pool wrapper, repository, tool cache and gazetteer, backed by SQLite
+    weather_db = os.path.join(BENCH_DIR, 'weather.sqlite3')
+    seed_weather_db(weather_db)
+    db_pool._pool = SqlitePool(weather_db, DB_POOL_MAX_SIZE)
+    await chatbot.gazetteer.refresh()
+    chatbot.generation_tracker.start()
+
+    tool_calls: list[str] = []
+    model = stub_model(args.tokens, args.tokens_per_second, args.first_token_delay / 1000, tool_calls)
+    stats = RoundStats()
+    with chatbot.agent.override(model=model):
+        start = time.perf_counter()
+        await asyncio.gather(*(simulate_user(uid, args.turns, args.think_time / 1000, stats)
+                               for uid in range(args.users)))
+        elapsed = time.perf_counter() - start
+
+    report = summarize(stats, elapsed)
+    report['config'] = {
+        'users': args.users, 'turns': args.turns, 'tokens': args.tokens,
+        'tokens_per_second': args.tokens_per_second, 'first_token_delay_ms': args.first_token_delay,
+    }
+    report['tools'] = {
+        'calls': len(tool_calls),
+        'weather_cache_entries': len(chatbot.weather_cache),
+        'response_cache_entries': len(chatbot.response_cache),
+    }
+    report['history'] = history_footprint()
+    # ru_maxrss is reported in kilobytes on Linux
+    report['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    if args.trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        report['traced_memory_growth_mb'] = round((current - memory_before) / 2**20, 2)
+        report['traced_memory_peak_mb'] = round(peak / 2**20, 2)
+        tracemalloc.stop()
+
+    await chatbot.generation_tracker.stop()
+    await db_pool.close_db_pool()
+    await chatbot.conversation_store.stop()
+    chatbot.shared_store.close()
+    shutil.rmtree(BENCH_DIR, ignore_errors=True)
+    return report
+
+def check_thresholds(report: dict, args) -> list[str]:
+    """Describe every limit the run exceeded"""
+    failures = []
+    if args.max_p95_ttft is not None and report['ttft_ms']['p95'] > args.max_p95_ttft:
+        failures.append(f"p95 TTFT {report['ttft_ms']['p95']} ms > {args.max_p95_ttft} ms")
+    if args.max_p95_latency is not None and report['latency_ms']['p95'] > args.max_p95_latency:
+        failures.append(f"p95 latency {report['latency_ms']['p95']} ms > {args.max_p95_latency} ms")
+    if args.max_history_mb is not None and report['history']['serialized_bytes'] / 2**20 > args.max_history_mb:
+        failures.append(f"conversation history above {args.max_history_mb} MB")
+    if report['errors']:
+        failures.append(f"{report['errors']} failed requests")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /chat with a stubbed model and a seeded SQLite weather database")
+    parser.add_argument('--users', type=int, default=50, help="concurrent simulated users")
+    parser.add_argument('--turns', type=int, default=5, help="messages sent by each user")
+    parser.add_argument('--tokens', type=int, default=100, help="tokens streamed per answer")
+    parser.add_argument('--tokens-per-second', type=float, default=200,
+                        help="streaming rate of the stub model (0 = as fast as possible)")
+    parser.add_argument('--first-token-delay', type=float, default=50, help="model latency before the first token, ms")
+    parser.add_argument('--think-time', type=float, default=0, help="pause between a user's messages, ms")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="track Python allocations with tracemalloc (slows the run down)")
+    parser.add_argument('--output', help="also write the report to this JSON file")
+    parser.add_argument('--max-p95-ttft', type=float, help="fail if p95 time-to-first-token exceeds this, ms")
+    parser.add_argument('--max-p95-latency', type=float, help="fail if p95 request latency exceeds this, ms")
+    parser.add_argument('--max-history-mb', type=float, help="fail if in-memory histories exceed this size")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failures = check_thresholds(report, args)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
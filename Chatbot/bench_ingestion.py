@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+
+import fetch_weather_data
+from bench_stats import percentile
+from fetch_weather_data import (
+    LocationRefresh, build_daily_rows, build_hourly_rows, build_weather_row, fetch_weather_data_async,
+    get_db_connection, save_location_refresh,
+)
+from openweather_stub import StubSettings, start_stub_server
+from weather_providers import PROVIDERS
+
+# Benchmark rows are tagged so they can be removed afterwards
+NAME_PREFIX = 'bench-ingest-'
+
+def synthetic_locations(count: int, without_coordinates: float) -> list[dict]:
+    """Locations spread over Vietnam; a fraction has no coordinates and needs geocoding"""
+    geocoded = count - int(count * without_coordinates)
+    return [{
+        'id': i + 1,
+        'name': f"{NAME_PREFIX}{i}",
+        'latitude': 8.5 + (i * 0.0137) % 15 if i < geocoded else None,
+        'longitude': 102.2 + (i * 0.0291) % 7 if i < geocoded else None,
+    } for i in range(count)]
+
+def seed_locations(locations: list[dict], batch_size: int = 5000) -> list[dict]:
+    """Insert the synthetic locations and return them with their database ids"""
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("Could not connect to MySQL; use --skip-db to benchmark without it")
+    try:
+        cursor = connection.cursor(dictionary=True)
+        rows = [(location['name'], location['latitude'], location['longitude']) for location in locations]
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany("INSERT INTO location (name, latitude, longitude) VALUES (%s, %s, %s)",
+                               rows[start:start + batch_size])
+        connection.commit()
+        cursor.execute("SELECT id, name, latitude, longitude FROM location WHERE name LIKE %s ORDER BY id",
+                       (f"{NAME_PREFIX}%",))
+        return cursor.fetchall()
+    finally:
+        connection.close()
+
+def remove_seeded_locations():
+    """Delete benchmark locations and everything written for them"""
+    connection = get_db_connection()
+    if not connection:
+        return
+    try:
+        cursor = connection.cursor()
+        for table in ('weather_data', 'hourly_data', 'daily_data', 'data_generation', 'location_refresh'):
+            cursor.execute(f'''
+                DELETE t FROM {table} t JOIN location l ON l.id = t.location_id WHERE l.name LIKE %s
+            ''', (f"{NAME_PREFIX}%",))
+        cursor.execute("DELETE FROM location WHERE name LIKE %s", (f"{NAME_PREFIX}%",))
+        connection.commit()
+    finally:
+        connection.close()
+
+def build_rows_only(refresh: LocationRefresh) -> bool:
+    """Stand-in for save_location_refresh that converts the payloads but writes nothing"""
+    if refresh.weather_data:
+        build_weather_row(refresh.location_id, refresh.weather_data)
+    if refresh.forecast_data is not None:
+        build_hourly_rows(refresh.location_id, refresh.forecast_data)
+        build_daily_rows(refresh.location_id,
+                         refresh.daily_data if refresh.daily_data is not None else refresh.forecast_data)
+    return True
+
+def timed(save, durations: list[float]):
+    """Wrap a save function and record how long each call takes"""
+    def wrapper(refresh: LocationRefresh) -> bool:
+        start = time.perf_counter()
+        try:
+            return save(refresh)
+        finally:
+            durations.append(time.perf_counter() - start)
+    return wrapper
+
+async def run_size(count: int, args, settings: StubSettings | None) -> dict:
+    locations = synthetic_locations(count, args.without_coordinates)
+    if not args.skip_db:
+        locations = await asyncio.to_thread(seed_locations, locations)
+
+    durations: list[float] = []
+    save = timed(build_rows_only if args.skip_db else save_location_refresh, durations)
+    requests_before = (settings.requests, settings.throttled) if settings else (0, 0)
+    # fetch_weather_data logs every location; keep the benchmark output readable
+    output = sys.stdout if args.verbose else open(os.devnull, 'w')
+    try:
+        with contextlib.redirect_stdout(output):
+            stats = await fetch_weather_data_async(args.concurrency, args.calls_per_minute,
+                                                   locations=locations, api_key='bench', save=save,
+                                                   provider=args.provider)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if not args.skip_db:
+            await asyncio.to_thread(remove_seeded_locations)
+
+    writes_ms = [d * 1000 for d in durations]
+    report = {
+        'locations': count,
+        'refreshed': stats['refreshed'],
+        'wall_time_s': round(stats['elapsed'], 3),
+        'locations_per_s': round(count / stats['elapsed'], 1) if stats['elapsed'] else 0.0,
+        'write_ms': {
+            'mean': round(sum(writes_ms) / len(writes_ms), 3) if writes_ms else 0.0,
+            'p50': round(percentile(writes_ms, 50), 3),
+            'p95': round(percentile(writes_ms, 95), 3),
+            'p99': round(percentile(writes_ms, 99), 3),
+        },
+        'db': 'skipped' if args.skip_db else 'mysql',
+        'provider': args.provider,
+    }
+    if settings:
+        report['api_calls'] = settings.requests - requests_before[0]
+        report['throttled'] = settings.throttled - requests_before[1]
+    return report
+
+async def main(args) -> list[dict]:
+    settings = None
+    server = None
+    if args.base_url:
+        fetch_weather_data.OPENWEATHER_BASE_URL = args.base_url.rstrip('/')
+    else:
+        settings = StubSettings(args.latency / 1000, args.jitter / 1000, args.throttle_rate,
+                                args.quota_per_minute, args.retry_after, args.fixtures, args.onecall)
+        server = start_stub_server(settings)
+        fetch_weather_data.OPENWEATHER_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+
+    reports = []
+    try:
+        for count in args.locations:
+            report = await run_size(count, args, settings)
+            print(json.dumps(report))
+            reports.append(report)
+    finally:
+        if server:
+            server.shutdown()
+    return reports
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark fetch_weather_data against a local OpenWeather stub")
+    parser.add_argument('--locations', type=int, nargs='+', default=[100, 10000, 100000],
+                        help="location counts to benchmark, one run each")
+    parser.add_argument('--concurrency', type=int, default=fetch_weather_data.INGEST_CONCURRENCY)
+    parser.add_argument('--calls-per-minute', type=int, default=10**9,
+                        help="client-side quota; unlimited by default so the pipeline itself is measured")
+    parser.add_argument('--without-coordinates', type=float, default=0,
+                        help="fraction of locations that must be geocoded first")
+    parser.add_argument('--skip-db', action='store_true',
+                        help="convert payloads to rows without writing them, so no MySQL is needed")
+    parser.add_argument('--base-url', help="use an already running stub (or API) instead of starting one")
+    parser.add_argument('--latency', type=float, default=0, help="stub response delay, ms")
+    parser.add_argument('--jitter', type=float, default=0, help="random extra stub delay, ms")
+    parser.add_argument('--throttle-rate', type=float, default=0, help="fraction of stub calls answered with 429")
+    parser.add_argument('--quota-per-minute', type=int, default=0, help="stub-side quota before 429s (0 = unlimited)")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds on stub 429s")
+    parser.add_argument('--fixtures', help="directory with recorded payloads for the stub to replay")
+    parser.add_argument('--provider', choices=['auto', *PROVIDERS], default=fetch_weather_data.OPENWEATHER_PROVIDER,
+                        help="weather endpoints to ingest from")
+    parser.add_argument('--no-onecall', dest='onecall', action='store_false',
+                        help="make the stub reject One Call, like a plan without it")
+    parser.add_argument('--output', help="also write the reports to this JSON file")
+    parser.add_argument('--verbose', action='store_true', help="keep the per-location ingestion logs")
+    args = parser.parse_args()
+
+    reports = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
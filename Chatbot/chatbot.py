@@ -2,13 +2,11 @@ import asyncio
 from dotenv import load_dotenv, find_dotenv
 import os
 from openai import AsyncAzureOpenAI
-import mysql.connector
-from mysql.connector import Error
-from datetime import datetime
+from contextlib import asynccontextmanager
 
 from pydantic_ai import Agent, RunContext
 from pydantic_ai.common_tools.tavily import tavily_search_tool
-from pydantic_ai.messages import ModelMessage
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, UserPromptPart
 from pydantic_ai.models.gemini import GeminiModel
 from pydantic_ai.providers.google_gla import GoogleGLAProvider
 from pydantic import BaseModel
@@ -17,195 +15,113 @@ from dataclasses import asdict
 
 from fastapi import FastAPI
 from fastapi.responses import StreamingResponse
+
+from config import (
+    WEATHER_CACHE_SIZE, WEATHER_CACHE_TTL, GENERATION_POLL_INTERVAL, GAZETTEER_REFRESH_INTERVAL,
+    LOCATION_MATCH_RADIUS_KM, CONVERSATION_DB_PATH, CONVERSATION_CACHE_SIZE, CONVERSATION_MAX_MESSAGES,
+    CONVERSATION_MAX_TOKENS, CONVERSATION_IDLE_TTL, HISTORY_KEEP_TURNS, HISTORY_TOKEN_BUDGET,
+    HISTORY_SUMMARY_MAX_CHARS, HISTORY_TOOL_RESULT_MAX_CHARS, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL,
+    CONVERSATION_IO_THREADS, CONVERSATION_BACKEND, SHARED_STORE_BACKEND,
+    SHARED_STORE_PATH, SHARED_STORE_POOL_SIZE, CHATBOT_HOST, CHATBOT_PORT, CHATBOT_WORKERS, DEMAND_FLUSH_INTERVAL,
+    DB_POOL_MAX_SIZE, MYSQL_MAX_CONNECTIONS,
+)
+from conversation_store import ConversationStore, MySQLConversationBackend, SqliteConversationBackend
+from db_pool import init_db_pool, close_db_pool, create_sync_pool
+from demand_recorder import DemandRecorder
+from fast_path import (
+    classify_weather_question, detect_language, render_current, render_day, stream_chunks, target_date,
+)
+from gazetteer import Gazetteer
+from generation_tracker import GenerationTracker
+from history_compaction import compact_history
+from response_cache import ResponseCache
+from shared_store import MySQLSharedStore, SqliteSharedStore
+from tool_cache import AsyncTTLCache
+from tool_output import compact_record, join_lists, to_table
+from weather_repository import ChatDeps, WeatherRepository
 load_dotenv(find_dotenv())
 
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 model = GeminiModel(
     'gemini-2.0-flash', provider=GoogleGLAProvider(api_key=GEMINI_API_KEY)
 )
-agent = Agent(model)
-
-def get_db_connection():
-    """Create and return a database connection"""
-    try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='weather',
-            port = 3307 ,
-        )
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL database: {e}")
-        return None
+agent = Agent(model, deps_type=ChatDeps)
+
+# Tool results keyed by (tool, location_id) and grouped by location; data only changes when fetch_weather_data runs
+weather_cache = AsyncTTLCache(WEATHER_CACHE_SIZE, WEATHER_CACHE_TTL, group_of=lambda key: key[-1])
+
+# Drops cached tool results as soon as the ingestion job commits fresh rows for a location
+generation_tracker = GenerationTracker(GENERATION_POLL_INTERVAL)
+generation_tracker.subscribe(weather_cache.invalidate_group)
+
+def create_shared_store():
+    """Pick the store that lets every worker reuse answers computed by the others"""
+    if SHARED_STORE_BACKEND == 'mysql':
+        return MySQLSharedStore(create_sync_pool('shared_store', SHARED_STORE_POOL_SIZE), SHARED_STORE_POOL_SIZE)
+    return SqliteSharedStore(SHARED_STORE_PATH)
+
+shared_store = create_shared_store()
+
+# Answers replayed for repeated questions about the same places and data generations
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, shared=shared_store)
+
+# Place names resolved in memory, reloaded incrementally from location and search_history
+gazetteer = Gazetteer(GAZETTEER_REFRESH_INTERVAL)
+
+# Locations people ask about, handed to the ingester so it refreshes them more often
+demand_recorder = DemandRecorder(DEMAND_FLUSH_INTERVAL)
+
+# All location and weather reads of the tools and the fast path go through here
+weather_repository = WeatherRepository(gazetteer, weather_cache, LOCATION_MATCH_RADIUS_KM, demand_recorder)
 
 @agent.tool
-async def get_latitute_longtitue(ctx, location: str) -> tuple[float, float]:
+async def get_latitute_longtitue(ctx: RunContext[ChatDeps], location: str) -> tuple[float, float]:
     """Get latitude and longtitude from location"""
     print(f"Getting coordinates for location: {location}")
-    connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor()
-            # First check if location exists in location table (case-insensitive)
-            cursor.execute("SELECT latitude, longitude FROM location WHERE LOWER(name) = LOWER(%s)", (location,))
-            result = cursor.fetchone()
-            if result:
-                return result
-            
-            # If not found in location table, check search_history (case-insensitive)
-            cursor.execute("SELECT lat, lon FROM search_history WHERE LOWER(location) = LOWER(%s) ORDER BY searched_at DESC LIMIT 1", (location,))
-            result = cursor.fetchone()
-            if result:
-                return result
-            
-            return None
-        except Error as e:
-            print(f"Error querying database: {e}")
-            return None
-        finally:
-            cursor.close()
-            connection.close()
-    return None
+    coordinates = await weather_repository.find_coordinates(location)
+    ctx.deps.tool_failed |= coordinates is None
+    return coordinates
 
 @agent.tool
-async def get_current_weather(ctx, latitude: float, longtitude: float):
-    """Query weather databases to get current temperature for location defined by its latitude and longtitude"""
+async def get_current_weather(ctx: RunContext[ChatDeps], latitude: float, longtitude: float, fields: list[str] | None = None):
+    """Query weather databases to get current temperature for location defined by its latitude and longtitude.
+    fields optionally limits the result to some of: temperature, feels_like, humidity, wind_speed,
+    description, main, icon, updated_at"""
     print(f"Getting weather for coordinates: {latitude}, {longtitude}")
-    connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor(dictionary=True)
-            # First find the location_id
-            cursor.execute("SELECT id FROM location WHERE latitude = %s AND longitude = %s", (latitude, longtitude))
-            location = cursor.fetchone()
-            
-            if location:
-                # Get current weather data
-                cursor.execute("""
-                    SELECT temperature, feelsLike, humidity, windSpeed, description, main, icon, updatedAt
-                    FROM weather_data
-                    WHERE location_id = %s
-                    ORDER BY updatedAt DESC
-                    LIMIT 1
-                """, (location['id'],))
-                weather = cursor.fetchone()
-                
-                if weather:
-                    return {
-                        'temperature': weather['temperature'],
-                        'feels_like': weather['feelsLike'],
-                        'humidity': weather['humidity'],
-                        'wind_speed': weather['windSpeed'],
-                        'description': weather['description'],
-                        'main': weather['main'],
-                        'icon': weather['icon'],
-                        'updated_at': weather['updatedAt']
-                    }
-            
-            return None
-        except Error as e:
-            print(f"Error querying database: {e}")
-            return None
-        finally:
-            cursor.close()
-            connection.close()
-    return None
+    weather = await weather_repository.current_weather(ctx.deps, latitude, longtitude)
+    ctx.deps.tool_failed |= weather is None
+    return compact_record(weather, fields=fields) if weather else None
 
 @agent.tool
-async def get_hourly_forecast(ctx, latitude: float, longtitude: float):
-    """Get hourly weather forecast for the next 24 hours"""
+async def get_hourly_forecast(ctx: RunContext[ChatDeps], latitude: float, longtitude: float, fields: list[str] | None = None):
+    """Get hourly weather forecast for the next 24 hours as a table of columns and rows.
+    fields optionally limits the columns to some of: temperature_max, temperature_min, humidity, icon
+    (time is always included)"""
     print(f"Getting hourly forecast for coordinates: {latitude}, {longtitude}")
-    connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor(dictionary=True)
-            # Find the location_id
-            cursor.execute("SELECT id FROM location WHERE latitude = %s AND longitude = %s", (latitude, longtitude))
-            location = cursor.fetchone()
-            
-            if location:
-                # Get hourly forecast data
-                cursor.execute("""
-                    SELECT time, temperatureMax, temperatureMin, humidity, icon
-                    FROM hourly_data
-                    WHERE location_id = %s
-                    ORDER BY time ASC
-                    LIMIT 24
-                """, (location['id'],))
-                forecast = cursor.fetchall()
-                
-                if forecast:
-                    return [{
-                        'time': datetime.fromtimestamp(item['time']).strftime('%H:%M:%S'),
-                        'temperature_max': item['temperatureMax'],
-                        'temperature_min': item['temperatureMin'],
-                        'humidity': item['humidity'],
-                        'icon': item['icon']
-                    } for item in forecast]
-            
-            return None
-        except Error as e:
-            print(f"Error querying database: {e}")
-            return None
-        finally:
-            cursor.close()
-            connection.close()
-    return None
+    forecast = await weather_repository.forecast('hourly', ctx.deps, latitude, longtitude)
+    ctx.deps.tool_failed |= forecast is None
+    return to_table(forecast, fields=fields) if forecast else None
 
 @agent.tool
-async def get_daily_forecast(ctx, latitude: float, longtitude: float):
-    """Get daily weather forecast for the next 7 days"""
+async def get_daily_forecast(ctx: RunContext[ChatDeps], latitude: float, longtitude: float, fields: list[str] | None = None):
+    """Get daily weather forecast for the next 7 days as a table of columns and rows.
+    fields optionally limits the columns to some of: temperature_max, temperature_min, humidity, icon
+    (time is always included)"""
     print(f"Getting daily forecast for coordinates: {latitude}, {longtitude}")
-    connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor(dictionary=True)
-            # Find the location_id
-            cursor.execute("SELECT id FROM location WHERE latitude = %s AND longitude = %s", (latitude, longtitude))
-            location = cursor.fetchone()
-            
-            if location:
-                # Get daily forecast data
-                cursor.execute("""
-                    SELECT time, temperatureMax, temperatureMin, humidity, icon
-                    FROM daily_data
-                    WHERE location_id = %s
-                    ORDER BY time ASC
-                    LIMIT 7
-                """, (location['id'],))
-                forecast = cursor.fetchall()
-                
-                if forecast:
-                    return [{
-                        'time': datetime.fromtimestamp(item['time']).strftime('%d/%m/%Y'),
-                        'temperature_max': item['temperatureMax'],
-                        'temperature_min': item['temperatureMin'],
-                        'humidity': item['humidity'],
-                        'icon': item['icon']
-                    } for item in forecast]
-            
-            return None
-        except Error as e:
-            print(f"Error querying database: {e}")
-            return None
-        finally:
-            cursor.close()
-            connection.close()
-    return None
+    forecast = await weather_repository.forecast('daily', ctx.deps, latitude, longtitude)
+    ctx.deps.tool_failed |= forecast is None
+    return to_table(forecast, fields=fields) if forecast else None
 
 @agent.tool
-async def recommend_outfit(ctx, latitude: float, longtitude: float):
+async def recommend_outfit(ctx: RunContext[ChatDeps], latitude: float, longtitude: float):
     """Analyze weather data and recommend appropriate clothing and accessories"""
     print(f"Getting recommendations for coordinates: {latitude}, {longtitude}")
     
-    # Get all weather data
-    current_weather = await get_current_weather(ctx, latitude, longtitude)
-    hourly_forecast = await get_hourly_forecast(ctx, latitude, longtitude)
-    daily_forecast = await get_daily_forecast(ctx, latitude, longtitude)
+    # Recommendations only use current conditions; hourly and daily forecasts are not needed
+    current_weather = await weather_repository.current_weather(ctx.deps, latitude, longtitude)
     
     if not current_weather:
+        ctx.deps.tool_failed = True
         return "Không thể lấy thông tin thời tiết hiện tại."
     
     recommendations = {
@@ -296,30 +212,130 @@ async def recommend_outfit(ctx, latitude: float, longtitude: float):
             "Đọc sách"
         ])
     
-    # Format recommendations
+    # Format recommendations (phrases joined into strings, empty categories dropped)
     response = {
-        "current_weather": {
+        "current_weather": compact_record({
             "temperature": temp,
             "description": current_weather['description'],
             "humidity": humidity,
             "wind_speed": wind_speed
-        },
-        "recommendations": recommendations
+        }),
+        "recommendations": join_lists(recommendations)
     }
     
     return response
 
-conversations_history: dict[str, list[ModelMessage]] = {}
+def create_conversation_backend():
+    """Pick where conversation histories are persisted"""
+    if CONVERSATION_BACKEND == 'mysql':
+        # One connection per store thread: an exhausted mysql.connector pool raises instead of waiting
+        return MySQLConversationBackend(create_sync_pool('conversations', CONVERSATION_IO_THREADS))
+    return SqliteConversationBackend(CONVERSATION_DB_PATH)
+
+conversation_store = ConversationStore(
+    create_conversation_backend(),
+    max_conversations=CONVERSATION_CACHE_SIZE,
+    max_messages=CONVERSATION_MAX_MESSAGES,
+    max_tokens=CONVERSATION_MAX_TOKENS,
+    idle_ttl=CONVERSATION_IDLE_TTL,
+    io_threads=CONVERSATION_IO_THREADS,
+)
+
+async def answer_simple_question(message: str) -> str | None:
+    """Answer templated "weather in X now/today/tomorrow" questions straight from the database"""
+    intent = classify_weather_question(message)
+    if intent is None:
+        return None
+    # Exact names and aliases only: a prefix such as "Ho" may be a different place, so the agent resolves it
+    place = gazetteer.lookup(intent.place, prefix=False)
+    if place is None or place.location_id is None:
+        return None
+
+    if intent.when == 'now':
+        weather = await weather_repository.current_weather_by_id(place.location_id)
+        return render_current(place.name, weather, intent.language) if weather else None
+
+    forecast = await weather_repository.forecast_by_id('daily', place.location_id)
+    day = target_date(intent.when).strftime('%d/%m/%Y')
+    for row in forecast or []:
+        if row['time'] == day:
+            return render_day(place.name, row, intent.when, intent.language)
+    return None
 
 async def chat(conversation_id: str, message: str):
-    conversations = conversations_history.get(conversation_id, [])
-    async with agent.run_stream(message, message_history=conversations) as response:
+    conversations = compact_history(
+        await conversation_store.load(conversation_id),
+        keep_turns=HISTORY_KEEP_TURNS,
+        token_budget=HISTORY_TOKEN_BUDGET,
+        summary_max_chars=HISTORY_SUMMARY_MAX_CHARS,
+        tool_result_max_chars=HISTORY_TOOL_RESULT_MAX_CHARS,
+    )
+
+    # Common questions skip the model entirely; anything open-ended falls through to the agent
+    answer = await answer_simple_question(message)
+    if answer is not None:
+        for chunk in stream_chunks(answer):
+            yield chunk
+        conversations.extend([
+            ModelRequest(parts=[UserPromptPart(content=message)]),
+            ModelResponse(parts=[TextPart(content=answer)]),
+        ])
+        await conversation_store.save(conversation_id, conversations)
+        return
+
+    # Opening questions about a known place can replay an earlier answer for the same data; later turns
+    # depend on (and may repeat) the conversation so far, which must never be served to another user
+    places = gazetteer.places_in_text(message) if not conversations else []
+    cache_key = None
+    # Every place asked about must be a stored location, so its data generation versions the answer
+    if places and all(place.location_id is not None for place in places):
+        generations = tuple((place.location_id, generation_tracker.generation_of(place.location_id))
+                            for place in places)
+        cache_key = (message, generations, detect_language(message))
+        tokens = await response_cache.lookup(*cache_key)
+        if tokens is not None:
+            for place in places:
+                demand_recorder.record(place.location_id)
+            for token in tokens:
+                yield token
+            conversations.extend([
+                ModelRequest(parts=[UserPromptPart(content=message)]),
+                ModelResponse(parts=[TextPart(content=''.join(tokens))]),
+            ])
+            await conversation_store.save(conversation_id, conversations)
+            return
+
+    deps = ChatDeps()
+    async with agent.run_stream(message, message_history=conversations, deps=deps) as response:
+        tokens = []
         async for token in response.stream_text(delta=True):
+            tokens.append(token)
             yield token
         conversations.extend(response.new_messages())
-        conversations_history[conversation_id] = conversations
+        await conversation_store.save(conversation_id, conversations)
+    # An answer written around a failed tool call would outlive the failure for the whole generation
+    if cache_key is not None and not deps.tool_failed:
+        await response_cache.store(*cache_key, tokens)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared database pool on startup and drain it on shutdown"""
+    await init_db_pool()
+    generation_tracker.start()
+    gazetteer.start()
+    conversation_store.start()
+    shared_store.start()
+    demand_recorder.start()
+    yield
+    await demand_recorder.stop()
+    await shared_store.stop()
+    shared_store.close()
+    await conversation_store.stop()
+    await gazetteer.stop()
+    await generation_tracker.stop()
+    await close_db_pool()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 class MessageRequest(BaseModel):
     uid: str
@@ -334,4 +350,24 @@ async def chat_endpoint(message: MessageRequest):
     return StreamingResponse(
         generate_response(),
         media_type="text/plain; charset=utf-8"  
-    )
\ No newline at end of file
+    )
+
+def connections_per_worker() -> int:
+    """Most MySQL connections one worker can hold: the async pool plus the MySQL-backed stores"""
+    connections = DB_POOL_MAX_SIZE
+    if CONVERSATION_BACKEND == 'mysql':
+        connections += CONVERSATION_IO_THREADS
+    if SHARED_STORE_BACKEND == 'mysql':
+        connections += SHARED_STORE_POOL_SIZE
+    return connections
+
+if __name__ == "__main__":
+    import uvicorn
+
+    connections = CHATBOT_WORKERS * connections_per_worker()
+    if connections > MYSQL_MAX_CONNECTIONS:
+        print(f"Warning: {CHATBOT_WORKERS} workers may open {connections} MySQL connections, above "
+              f"MYSQL_MAX_CONNECTIONS={MYSQL_MAX_CONNECTIONS}; lower CHATBOT_WORKERS or DB_POOL_MAX_SIZE")
+
+    # All per-user state lives in the shared stores, so requests need no sticky routing between workers
+    uvicorn.run("chatbot:app", host=CHATBOT_HOST, port=CHATBOT_PORT, workers=CHATBOT_WORKERS)
@@ -0,0 +1,117 @@
+import os
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+
+# MySQL connection settings (defaults match the local development database)
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'weather'),
+    'port': int(os.getenv('DB_PORT', '3307')),
+}
+
+# Size of the async connection pool shared by the chatbot tools
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+# Seconds after which idle pooled connections are recycled
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '3600'))
+
+# OpenWeather API root; point it at openweather_stub.py to run ingestion offline
+OPENWEATHER_BASE_URL = os.getenv('OPENWEATHER_BASE_URL', 'https://api.openweathermap.org').rstrip('/')
+# OpenWeather API quota (calls per minute allowed by the subscription plan)
+OPENWEATHER_CALLS_PER_MINUTE = int(os.getenv('OPENWEATHER_CALLS_PER_MINUTE', '60'))
+# Maximum number of locations refreshed concurrently by the async ingester
+INGEST_CONCURRENCY = int(os.getenv('INGEST_CONCURRENCY', '20'))
+
+# How often fetch_weather_data refreshes the database (seconds)
+INGEST_INTERVAL_SECONDS = int(os.getenv('INGEST_INTERVAL_SECONDS', '3600'))
+# Chatbot tool result cache; entries live as long as one ingestion interval by default
+WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', str(INGEST_INTERVAL_SECONDS)))
+WEATHER_CACHE_SIZE = int(os.getenv('WEATHER_CACHE_SIZE', '2048'))
+# How often the chatbot polls data_generation for refreshed locations (seconds)
+GENERATION_POLL_INTERVAL = float(os.getenv('GENERATION_POLL_INTERVAL', '5'))
+# How often the chatbot reloads new place names into its gazetteer (seconds)
+GAZETTEER_REFRESH_INTERVAL = float(os.getenv('GAZETTEER_REFRESH_INTERVAL', '60'))
+# Coordinates within this distance of a stored location resolve to it (kilometres)
+LOCATION_MATCH_RADIUS_KM = float(os.getenv('LOCATION_MATCH_RADIUS_KM', '5'))
+
+# Conversation history storage
+CONVERSATION_DB_PATH = os.getenv('CONVERSATION_DB_PATH', os.path.join(os.path.dirname(__file__), 'conversations.sqlite3'))
+# Conversations kept decoded in memory per worker
+CONVERSATION_CACHE_SIZE = int(os.getenv('CONVERSATION_CACHE_SIZE', '1000'))
+# Per-conversation caps; the oldest turns are dropped first
+CONVERSATION_MAX_MESSAGES = int(os.getenv('CONVERSATION_MAX_MESSAGES', '60'))
+CONVERSATION_MAX_TOKENS = int(os.getenv('CONVERSATION_MAX_TOKENS', '8000'))
+# Conversations idle for longer than this are deleted (seconds)
+CONVERSATION_IDLE_TTL = int(os.getenv('CONVERSATION_IDLE_TTL', '86400'))
+# History compaction before each model call: recent turns stay verbatim, older ones are summarized
+HISTORY_KEEP_TURNS = int(os.getenv('HISTORY_KEEP_TURNS', '4'))
+HISTORY_TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', '3000'))
+HISTORY_SUMMARY_MAX_CHARS = int(os.getenv('HISTORY_SUMMARY_MAX_CHARS', '2000'))
+HISTORY_TOOL_RESULT_MAX_CHARS = int(os.getenv('HISTORY_TOOL_RESULT_MAX_CHARS', '400'))
+# Cache of model answers; entries are also keyed by data generation, so they go stale on refresh
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '5000'))
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', str(INGEST_INTERVAL_SECONDS)))
+
+# Seconds a chatbot request may wait for a pooled connection, and for the queries run on it
+DB_ACQUIRE_TIMEOUT = float(os.getenv('DB_ACQUIRE_TIMEOUT', '2'))
+DB_QUERY_TIMEOUT = float(os.getenv('DB_QUERY_TIMEOUT', '5'))
+# Threads used for the conversation store's blocking calls (also its MySQL pool size)
+CONVERSATION_IO_THREADS = int(os.getenv('CONVERSATION_IO_THREADS', '4'))
+
+# Where state shared by all chatbot workers lives: 'sqlite' (one host) or 'mysql' (several hosts)
+CONVERSATION_BACKEND = os.getenv('CONVERSATION_BACKEND', 'sqlite')
+SHARED_STORE_BACKEND = os.getenv('SHARED_STORE_BACKEND', 'sqlite')
+SHARED_STORE_PATH = os.getenv('SHARED_STORE_PATH', os.path.join(os.path.dirname(__file__), 'shared_cache.sqlite3'))
+# Blocking mysql.connector pool (and thread count) of the MySQL shared store
+SHARED_STORE_POOL_SIZE = int(os.getenv('SHARED_STORE_POOL_SIZE', '4'))
+
+# HTTP server started by `python chatbot.py`
+CHATBOT_HOST = os.getenv('CHATBOT_HOST', '0.0.0.0')
+CHATBOT_PORT = int(os.getenv('CHATBOT_PORT', '8000'))
+# Every worker opens its own MySQL pools, so more workers need a larger server max_connections
+CHATBOT_WORKERS = int(os.getenv('CHATBOT_WORKERS', '1'))
+# Server-side connection limit the workers are checked against at startup (MySQL's default)
+MYSQL_MAX_CONNECTIONS = int(os.getenv('MYSQL_MAX_CONNECTIONS', '151'))
+
+# Refresh scheduling: locations people ask about are refreshed often, the rest rarely (seconds)
+REFRESH_HOT_INTERVAL = int(os.getenv('REFRESH_HOT_INTERVAL', '900'))
+REFRESH_WARM_INTERVAL = int(os.getenv('REFRESH_WARM_INTERVAL', str(INGEST_INTERVAL_SECONDS)))
+REFRESH_COLD_INTERVAL = int(os.getenv('REFRESH_COLD_INTERVAL', '21600'))
+# Decayed request counts at which a location becomes hot or warm
+REFRESH_HOT_DEMAND = float(os.getenv('REFRESH_HOT_DEMAND', '5'))
+REFRESH_WARM_DEMAND = float(os.getenv('REFRESH_WARM_DEMAND', '0.5'))
+# Demand halves after this many seconds without new requests
+DEMAND_HALF_LIFE = float(os.getenv('DEMAND_HALF_LIFE', '86400'))
+# How often the chatbot writes the locations it was asked about (seconds)
+DEMAND_FLUSH_INTERVAL = float(os.getenv('DEMAND_FLUSH_INTERVAL', '30'))
+
+# Resident ingestion service (ingestion_service.py)
+INGEST_HEALTH_HOST = os.getenv('INGEST_HEALTH_HOST', '127.0.0.1')
+INGEST_HEALTH_PORT = int(os.getenv('INGEST_HEALTH_PORT', '8091'))
+# How often the schedule is reloaded to pick up new locations and demand (seconds)
+INGEST_RELOAD_INTERVAL = float(os.getenv('INGEST_RELOAD_INTERVAL', '300'))
+# Delay before a failed location is tried again (seconds)
+INGEST_RETRY_DELAY = float(os.getenv('INGEST_RETRY_DELAY', '300'))
+# Time given to in-flight refreshes on shutdown (seconds)
+INGEST_SHUTDOWN_TIMEOUT = float(os.getenv('INGEST_SHUTDOWN_TIMEOUT', '30'))
+
+# OpenWeather HTTP client: seconds to open a connection and to wait for each read
+OPENWEATHER_CONNECT_TIMEOUT = float(os.getenv('OPENWEATHER_CONNECT_TIMEOUT', '5'))
+OPENWEATHER_READ_TIMEOUT = float(os.getenv('OPENWEATHER_READ_TIMEOUT', '30'))
+# Negotiate HTTP/2 when the h2 package is installed
+OPENWEATHER_HTTP2 = os.getenv('OPENWEATHER_HTTP2', 'true').lower() in ('1', 'true', 'yes')
+
+# Retries of failed OpenWeather calls (429, 5xx, timeouts) with jittered exponential backoff
+INGEST_MAX_RETRIES = int(os.getenv('INGEST_MAX_RETRIES', '3'))
+INGEST_BACKOFF_BASE = float(os.getenv('INGEST_BACKOFF_BASE', '1'))
+INGEST_BACKOFF_MAX = float(os.getenv('INGEST_BACKOFF_MAX', '60'))
+# Extra passes over the locations that still failed at the end of a run
+INGEST_REQUEUE_ROUNDS = int(os.getenv('INGEST_REQUEUE_ROUNDS', '1'))
+
+# Weather source per refresh: 'standard' (/weather + /forecast), 'onecall' (/data/3.0/onecall, one call)
+# or 'auto' (One Call, falling back to standard if the plan does not include it). One Call is billed per
+# call above its free daily tier, so deployments opt in explicitly
+OPENWEATHER_PROVIDER = os.getenv('OPENWEATHER_PROVIDER', 'standard')
@@ -0,0 +1,237 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelRequest, UserPromptPart
+
+from background import BlockingIO, PeriodicTask
+
+def estimate_tokens(message: ModelMessage) -> int:
+    """Rough token count of a message (about 4 characters per token)"""
+    characters = 0
+    for part in message.parts:
+        content = getattr(part, 'content', None)
+        if content is None:
+            content = getattr(part, 'args', '')
+        characters += len(content) if isinstance(content, str) else len(str(content))
+    return characters // 4 + 1
+
+def is_turn_start(message: ModelMessage) -> bool:
+    """A turn starts with a request carrying the user's prompt"""
+    return isinstance(message, ModelRequest) and any(isinstance(part, UserPromptPart) for part in message.parts)
+
+def trim_history(messages: list[ModelMessage], max_messages: int, max_tokens: int) -> list[ModelMessage]:
+    """Drop the oldest whole turns until the history fits both caps, always keeping the latest turn"""
+    total_tokens = sum(estimate_tokens(message) for message in messages)
+    start = 0
+    while len(messages) - start > max_messages or total_tokens > max_tokens:
+        # Cut at the next turn boundary so tool calls are never separated from their results
+        next_start = next((i for i in range(start + 1, len(messages)) if is_turn_start(messages[i])), None)
+        if next_start is None:
+            break
+        total_tokens -= sum(estimate_tokens(message) for message in messages[start:next_start])
+        start = next_start
+    return messages[start:]
+
+class SqliteConversationBackend:
+    """Durable conversation storage in a local SQLite file, shareable by workers on one host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets several worker processes read while one writes
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS conversations(
+                conversation_id TEXT PRIMARY KEY,
+                messages BLOB NOT NULL,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at)")
+        self._connection.commit()
+
+    def version(self, conversation_id: str) -> int | None:
+        """Return the stored version of a conversation"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT version FROM conversations WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load(self, conversation_id: str) -> tuple[bytes, int] | None:
+        """Return (serialized messages, version) of a conversation"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT messages, version FROM conversations WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+
+    def save(self, conversation_id: str, messages: bytes) -> int:
+        """Store serialized messages and return the new version"""
+        with self._lock:
+            row = self._connection.execute('''
+                INSERT INTO conversations (conversation_id, messages, version, updated_at) VALUES (?, ?, 1, ?)
+                ON CONFLICT(conversation_id) DO UPDATE SET
+                    messages = excluded.messages, version = version + 1, updated_at = excluded.updated_at
+                RETURNING version
+            ''', (conversation_id, messages, time.time())).fetchone()
+            self._connection.commit()
+        return row[0]
+
+    def purge_idle(self, idle_seconds: float) -> int:
+        """Delete conversations untouched for longer than idle_seconds"""
+        with self._lock:
+            cursor = self._connection.execute(
+                "DELETE FROM conversations WHERE updated_at < ?", (time.time() - idle_seconds,)
+            )
+            self._connection.commit()
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+class MySQLConversationBackend:
+    """Durable conversation storage in the weather database, shared by workers on any host"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def version(self, conversation_id: str) -> int | None:
+        """Return the stored version of a conversation"""
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT version FROM conversation_state WHERE conversation_id = %s", (conversation_id,))
+            row = cursor.fetchone()
+            cursor.close()
+            return row[0] if row else None
+        finally:
+            connection.close()
+
+    def load(self, conversation_id: str) -> tuple[bytes, int] | None:
+        """Return (serialized messages, version) of a conversation"""
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT messages, version FROM conversation_state WHERE conversation_id = %s", (conversation_id,)
+            )
+            row = cursor.fetchone()
+            cursor.close()
+            return (bytes(row[0]), row[1]) if row else None
+        finally:
+            connection.close()
+
+    def save(self, conversation_id: str, messages: bytes) -> int:
+        """Store serialized messages and return the new version"""
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            # LAST_INSERT_ID(expr) returns the bumped version without a second lookup
+            cursor.execute('''
+                INSERT INTO conversation_state (conversation_id, messages, version, updated_at)
+                VALUES (%s, %s, LAST_INSERT_ID(1), %s)
+                ON DUPLICATE KEY UPDATE
+                    messages = VALUES(messages), version = LAST_INSERT_ID(version + 1), updated_at = VALUES(updated_at)
+            ''', (conversation_id, messages, time.time()))
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            version = cursor.fetchone()[0]
+            cursor.close()
+            return version
+        finally:
+            connection.close()
+
+    def purge_idle(self, idle_seconds: float) -> int:
+        """Delete conversations untouched for longer than idle_seconds"""
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("DELETE FROM conversation_state WHERE updated_at < %s", (time.time() - idle_seconds,))
+            removed = cursor.rowcount
+            cursor.close()
+            return removed
+        finally:
+            connection.close()
+
+    def close(self):
+        pass
+
+@dataclass
+class _CachedConversation:
+    messages: list[ModelMessage]
+    version: int
+    last_access: float
+
+class ConversationStore:
+    """Conversation histories with a bounded in-memory LRU tier over a durable backend"""
+
+    def __init__(self, backend, max_conversations: int, max_messages: int, max_tokens: int, idle_ttl: float,
+                 io_threads: int = 4):
+        self.backend = backend
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.idle_ttl = idle_ttl
+        self._memory: OrderedDict[str, _CachedConversation] = OrderedDict()
+        self._purger = PeriodicTask(self.purge_idle, min(idle_ttl, 3600), 'purging conversations', delay_first=True)
+        # Backend calls block, so they run on a small dedicated pool instead of the event loop
+        self._io = BlockingIO(io_threads, 'conversation-store')
+
+    def __len__(self):
+        return len(self._memory)
+
+    def _remember(self, conversation_id: str, messages: list[ModelMessage], version: int):
+        self._memory[conversation_id] = _CachedConversation(messages, version, time.monotonic())
+        self._memory.move_to_end(conversation_id)
+        while len(self._memory) > self.max_conversations:
+            self._memory.popitem(last=False)
+
+    async def load(self, conversation_id: str) -> list[ModelMessage]:
+        """Return a copy of the conversation history (empty if unknown)"""
+        cached = self._memory.get(conversation_id)
+        if cached is not None:
+            # Another worker may have extended the conversation since it was cached
+            if await self._io.run(self.backend.version, conversation_id) == cached.version:
+                cached.last_access = time.monotonic()
+                self._memory.move_to_end(conversation_id)
+                return list(cached.messages)
+
+        row = await self._io.run(self.backend.load, conversation_id)
+        if row is None:
+            self._memory.pop(conversation_id, None)
+            return []
+        messages = ModelMessagesTypeAdapter.validate_json(row[0])
+        self._remember(conversation_id, messages, row[1])
+        return list(messages)
+
+    async def save(self, conversation_id: str, messages: list[ModelMessage]):
+        """Trim the history to the configured caps and persist it"""
+        messages = trim_history(messages, self.max_messages, self.max_tokens)
+        version = await self._io.run(
+            self.backend.save, conversation_id, ModelMessagesTypeAdapter.dump_json(messages)
+        )
+        self._remember(conversation_id, messages, version)
+
+    async def purge_idle(self):
+        """Evict idle conversations from memory and from the backend"""
+        cutoff = time.monotonic() - self.idle_ttl
+        for conversation_id in [cid for cid, cached in self._memory.items() if cached.last_access < cutoff]:
+            del self._memory[conversation_id]
+        removed = await self._io.run(self.backend.purge_idle, self.idle_ttl)
+        if removed:
+            print(f"Purged {removed} idle conversations")
+
+    def start(self):
+        """Purge idle conversations in the background"""
+        self._purger.start()
+
+    async def stop(self):
+        """Stop the background purge and the I/O threads"""
+        await self._purger.stop()
+        self._io.shutdown()
@@ -26,7 +26,10 @@ def create_weather_database():
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 name VARCHAR(255) NOT NULL,
                 latitude DOUBLE,
-                longitude DOUBLE
+                longitude DOUBLE,
+                name_normalized VARCHAR(255) AS (LOWER(TRIM(name))) STORED,
+                INDEX idx_location_name_normalized (name_normalized),
+                INDEX idx_location_coordinates (latitude, longitude)
             );
             ''')
             
@@ -53,6 +56,7 @@ def create_weather_database():
                 description TEXT,
                 main VARCHAR(255),
                 updatedAt VARCHAR(255),
+                INDEX idx_weather_data_location_updated (location_id, updatedAt),
                 FOREIGN KEY (location_id) REFERENCES location(id) ON DELETE CASCADE
             );
             ''')
@@ -67,6 +71,7 @@ def create_weather_database():
                 temperatureMin DOUBLE,
                 humidity INT,
                 icon VARCHAR(255),
+                INDEX idx_hourly_data_location_time (location_id, time),
                 FOREIGN KEY (location_id) REFERENCES location(id) ON DELETE CASCADE
             );
             ''')
@@ -81,6 +86,7 @@ def create_weather_database():
                 temperatureMin DOUBLE,
                 humidity INT,
                 icon VARCHAR(255),
+                INDEX idx_daily_data_location_time (location_id, time),
                 FOREIGN KEY (location_id) REFERENCES location(id) ON DELETE CASCADE
             );
             ''')
@@ -101,7 +107,53 @@ def create_weather_database():
                 location VARCHAR(255) NOT NULL,
                 searched_at VARCHAR(255) NOT NULL,
                 lat DOUBLE NOT NULL,
-                lon DOUBLE NOT NULL
+                lon DOUBLE NOT NULL,
+                location_normalized VARCHAR(255) AS (LOWER(TRIM(location))) STORED,
+                INDEX idx_search_history_location (location_normalized, searched_at, lat, lon)
+            );
+            ''')
+            
+            # Create data_generation table (location_id 0 holds the global counter)
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS data_generation(
+                location_id INT PRIMARY KEY,
+                generation BIGINT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_data_generation_generation (generation)
+            );
+            ''')
+            cursor.execute("INSERT INTO data_generation (location_id, generation) VALUES (0, 0)")
+
+            # Create location_refresh table (refresh schedule and demand; location_id 0 tracks search_history)
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS location_refresh(
+                location_id INT PRIMARY KEY,
+                last_fetched_at DOUBLE,
+                next_due_at DOUBLE,
+                demand DOUBLE NOT NULL DEFAULT 0,
+                demand_updated_at DOUBLE NOT NULL DEFAULT 0,
+                INDEX idx_location_refresh_next_due (next_due_at)
+            );
+            ''')
+
+            # Create conversation_state table (chat histories shared by every chatbot worker)
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_state(
+                conversation_id VARCHAR(255) PRIMARY KEY,
+                messages LONGBLOB NOT NULL,
+                version INT NOT NULL,
+                updated_at DOUBLE NOT NULL,
+                INDEX idx_conversation_state_updated_at (updated_at)
+            );
+            ''')
+
+            # Create shared_cache table (answers shared by every chatbot worker)
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS shared_cache(
+                cache_key CHAR(40) PRIMARY KEY,
+                value MEDIUMBLOB NOT NULL,
+                expires_at DOUBLE NOT NULL,
+                INDEX idx_shared_cache_expires_at (expires_at)
             );
             ''')
             
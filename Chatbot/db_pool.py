@@ -0,0 +1,72 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiomysql
+from mysql.connector import pooling
+
+from config import (
+    DB_CONFIG, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_RECYCLE, DB_ACQUIRE_TIMEOUT, DB_QUERY_TIMEOUT,
+)
+
+_pool: aiomysql.Pool | None = None
+_pool_lock = asyncio.Lock()
+
+async def init_db_pool() -> aiomysql.Pool:
+    """Create the process-wide async connection pool if it does not exist yet"""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await aiomysql.create_pool(
+                host=DB_CONFIG['host'],
+                port=DB_CONFIG['port'],
+                user=DB_CONFIG['user'],
+                password=DB_CONFIG['password'],
+                db=DB_CONFIG['database'],
+                minsize=DB_POOL_MIN_SIZE,
+                maxsize=DB_POOL_MAX_SIZE,
+                pool_recycle=DB_POOL_RECYCLE,
+                autocommit=True,
+                # The server also aborts runaway SELECTs, not just the client
+                init_command=f"SET SESSION MAX_EXECUTION_TIME={int(DB_QUERY_TIMEOUT * 1000)}",
+            )
+            print(f"Created database pool (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})")
+    return _pool
+
+def create_sync_pool(name: str, size: int, autocommit: bool = True) -> pooling.MySQLConnectionPool:
+    """Create a blocking mysql.connector pool for code that runs on worker threads"""
+    return pooling.MySQLConnectionPool(pool_name=name, pool_size=size, autocommit=autocommit, **DB_CONFIG)
+
+async def close_db_pool():
+    """Close all pooled connections, waiting for borrowed ones to be released"""
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            await _pool.wait_closed()
+            _pool = None
+            print("Database pool closed")
+
+@asynccontextmanager
+async def db_cursor(dictionary: bool = False):
+    """Borrow a pooled connection and yield a cursor on it.
+
+    Waiting for a connection and the work done with the cursor are both bounded; a timeout
+    surfaces as aiomysql.OperationalError so callers handle it like any other database error.
+    """
+    pool = _pool or await init_db_pool()
+    cursor_class = aiomysql.DictCursor if dictionary else aiomysql.Cursor
+    try:
+        connection = await asyncio.wait_for(pool.acquire(), DB_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise aiomysql.OperationalError(2013, "Timed out waiting for a pooled database connection")
+
+    try:
+        async with asyncio.timeout(DB_QUERY_TIMEOUT):
+            async with connection.cursor(cursor_class) as cursor:
+                yield cursor
+    except TimeoutError:
+        # The connection is mid-query; close it so it is not handed out again
+        connection.close()
+        raise aiomysql.OperationalError(2013, "Database query timed out")
+    finally:
+        pool.release(connection)
@@ -0,0 +1,41 @@
+import time
+from collections import Counter
+
+from background import PeriodicTask
+from db_pool import db_cursor
+from refresh_scheduler import RECORD_DEMAND_SQL, demand_rows
+
+class DemandRecorder:
+    """Count the locations the chatbot is asked about and hand them to the refresh scheduler in batches"""
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._hits: Counter[int] = Counter()
+        self._flusher = PeriodicTask(self.flush, flush_interval, 'flushing location demand', delay_first=True)
+
+    def record(self, location_id: int | None):
+        """Note one request for a location; cheap enough to call on every lookup"""
+        if location_id is not None:
+            self._hits[location_id] += 1
+
+    async def flush(self):
+        """Write the counts gathered since the last flush"""
+        if not self._hits:
+            return
+        hits, self._hits = self._hits, Counter()
+        try:
+            async with db_cursor() as cursor:
+                await cursor.executemany(RECORD_DEMAND_SQL, demand_rows(hits, time.time()))
+        except Exception as e:
+            # Keep the counts for the next attempt rather than losing them
+            self._hits.update(hits)
+            print(f"Error recording location demand: {e}")
+
+    def start(self):
+        """Flush counts in the background"""
+        self._flusher.start()
+
+    async def stop(self):
+        """Stop the background flush and write what is left"""
+        await self._flusher.stop()
+        await self.flush()
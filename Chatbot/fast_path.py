@@ -0,0 +1,122 @@
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from gazetteer import fold_accents
+
+# Vietnamese-only letters (after lower-casing) used to pick the answer language
+VIETNAMESE_CHARS = set('ăâđêôơưàảãáạằẳẵắặầẩẫấậèẻẽéẹềểễếệìỉĩíịòỏõóọồổỗốộờởỡớợùủũúụừửữứựỳỷỹýỵ')
+
+WHEN_WORDS = {
+    'bay gio': 'now', 'hien tai': 'now', 'hom nay': 'today', 'ngay mai': 'tomorrow',
+    'right now': 'now', 'now': 'now', 'currently': 'now', 'today': 'today', 'tomorrow': 'tomorrow',
+}
+_WHEN = '|'.join(sorted(WHEN_WORDS, key=len, reverse=True))
+
+# Templates are matched against the accent-folded, lower-cased question
+PATTERNS = [
+    # "thời tiết (ở) Hà Nội (hôm nay) (thế nào)?", "nhiệt độ tại Đà Nẵng bây giờ"
+    ('vi', re.compile(
+        rf'^(?:(?P<when1>{_WHEN})\s+)?(?:thoi tiet|nhiet do)\s+(?:(?:o|tai)\s+)?(?P<place>.+?)'
+        rf'(?:\s+(?P<when2>{_WHEN}))?(?:\s+(?:the nao|ra sao|nhu the nao|bao nhieu(?: do)?|sao))?$'
+    )),
+    # "Hà Nội hôm nay thời tiết thế nào?"
+    ('vi', re.compile(
+        rf'^(?:o\s+|tai\s+)?(?P<place>.+?)\s+(?P<when2>{_WHEN})\s+(?:thoi tiet|nhiet do)'
+        rf'(?:\s+(?:the nao|ra sao|nhu the nao|bao nhieu(?: do)?|sao))?$'
+    )),
+    # "what's the weather (like) in London (today)?", "how is the weather in Tokyo tomorrow"
+    ('en', re.compile(
+        rf'^(?:(?:what s|what is|whats|how s|how is|hows)\s+)?(?:the\s+)?(?:current\s+)?(?:weather|temperature)'
+        rf'(?:\s+like)?\s+(?:in|at|for)\s+(?P<place>.+?)(?:\s+(?P<when2>{_WHEN}))?$'
+    )),
+]
+
+CONDITIONS = {
+    '01': ('trời quang', 'clear sky'),
+    '02': ('ít mây', 'a few clouds'),
+    '03': ('có mây', 'cloudy'),
+    '04': ('nhiều mây', 'overcast'),
+    '09': ('mưa rào', 'showers'),
+    '10': ('có mưa', 'rain'),
+    '11': ('có dông', 'thunderstorms'),
+    '13': ('có tuyết', 'snow'),
+    '50': ('sương mù', 'mist'),
+}
+
+@dataclass
+class WeatherIntent:
+    place: str
+    when: str
+    language: str
+
+def detect_language(text: str) -> str:
+    """Return 'vi' if the text contains Vietnamese letters, otherwise 'en'"""
+    return 'vi' if any(char in VIETNAMESE_CHARS for char in text.lower()) else 'en'
+
+def classify_weather_question(message: str) -> WeatherIntent | None:
+    """Recognize simple "weather in X now/today/tomorrow" questions"""
+    text = ' '.join(re.sub(r"[^a-z0-9]+", ' ', fold_accents(message).lower()).split())
+    for language, pattern in PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        groups = match.groupdict()
+        when = groups.get('when1') or groups.get('when2')
+        place = match.group('place').strip()
+        if not place or len(place.split()) > 5:
+            return None
+        # A Vietnamese question written without accents still gets a Vietnamese answer
+        if language == 'en':
+            language = detect_language(message)
+        return WeatherIntent(place, WHEN_WORDS.get(when, 'now'), language)
+    return None
+
+def target_date(when: str) -> date:
+    """Calendar day an intent refers to"""
+    return date.today() + timedelta(days=1 if when == 'tomorrow' else 0)
+
+def describe(icon: str | None, language: str) -> str:
+    """Short condition text derived from an OpenWeather icon code"""
+    vi, en = CONDITIONS.get((icon or '')[:2], ('', ''))
+    return vi if language == 'vi' else en
+
+def _number(value) -> str:
+    return f"{round(value)}" if value is not None else '?'
+
+def render_current(place: str, weather: dict, language: str) -> str:
+    """Templated answer for the current conditions"""
+    condition = describe(weather.get('icon'), language)
+    if language == 'vi':
+        text = (f"Thời tiết hiện tại ở {place}: {_number(weather['temperature'])}°C "
+                f"(cảm giác như {_number(weather['feels_like'])}°C)")
+        if condition:
+            text += f", {condition}"
+        return text + f", độ ẩm {_number(weather['humidity'])}%, gió {weather['wind_speed']} m/s."
+    text = (f"Current weather in {place}: {_number(weather['temperature'])}°C "
+            f"(feels like {_number(weather['feels_like'])}°C)")
+    if condition:
+        text += f", {condition}"
+    return text + f", humidity {_number(weather['humidity'])}%, wind {weather['wind_speed']} m/s."
+
+def render_day(place: str, day: dict, when: str, language: str) -> str:
+    """Templated answer for one day of the daily forecast"""
+    condition = describe(day.get('icon'), language)
+    low, high = _number(day['temperature_min']), _number(day['temperature_max'])
+    if language == 'vi':
+        label = 'Ngày mai' if when == 'tomorrow' else 'Hôm nay'
+        text = f"{label} ({day['time']}) ở {place}: nhiệt độ từ {low}°C đến {high}°C"
+        if condition:
+            text += f", {condition}"
+        return text + f", độ ẩm khoảng {_number(day['humidity'])}%."
+    label = 'Tomorrow' if when == 'tomorrow' else 'Today'
+    text = f"{label} ({day['time']}) in {place}: {low}°C to {high}°C"
+    if condition:
+        text += f", {condition}"
+    return text + f", humidity around {_number(day['humidity'])}%."
+
+def stream_chunks(text: str):
+    """Split a rendered answer into word-sized chunks for the streaming response"""
+    words = text.split(' ')
+    for index, word in enumerate(words):
+        yield word if index == len(words) - 1 else word + ' '
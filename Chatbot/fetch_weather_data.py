@@ -1,21 +1,44 @@
 import os
-import requests
-from datetime import datetime
+import argparse
+import asyncio
+import httpx
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import mysql.connector
 from mysql.connector import Error
 from dotenv import load_dotenv
 import time
+from dataclasses import dataclass
+
+from config import (
+    DB_CONFIG, OPENWEATHER_BASE_URL, OPENWEATHER_CALLS_PER_MINUTE, INGEST_CONCURRENCY, INGEST_MAX_RETRIES,
+    INGEST_BACKOFF_BASE, INGEST_BACKOFF_MAX, INGEST_REQUEUE_ROUNDS, OPENWEATHER_PROVIDER,
+)
+from db_pool import create_sync_pool
+from http_client import create_async_client, get_client
+from rate_limiter import AdaptiveRateLimiter
+from refresh_scheduler import collect_search_demand, due_locations, mark_refreshed
+from weather_providers import PROVIDERS, FallbackProvider, WeatherBundle, create_provider
+
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Warm connection pool opened by long-running callers; one-shot runs connect per call
+_db_pool = None
+
+def open_db_pool(size: int):
+    """Keep size connections open so each save skips the connect handshake"""
+    global _db_pool
+    if _db_pool is None:
+        # Writes run in explicit transactions, so pooled connections must not autocommit
+        _db_pool = create_sync_pool('ingestion', size, autocommit=False)
 
 def get_db_connection():
     """Create and return a database connection"""
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='weather',
-            port = 3307 ,
-        )
+        # close() on a pooled connection hands it back to the pool
+        connection = _db_pool.get_connection() if _db_pool else mysql.connector.connect(**DB_CONFIG)
         return connection
     except Error as e:
         print(f"Error connecting to MySQL database: {e}")
@@ -31,167 +54,196 @@ def get_api_key():
     print(f"Using API key: {api_key}")
     return api_key
 
-def get_locations():
-    """Get all locations from database"""
+def get_due_locations(limit: int | None = None, everything: bool = False):
+    """Get locations whose refresh is due, after folding recent app searches into their demand"""
     connection = get_db_connection()
     if connection:
         try:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("SELECT id, name, latitude, longitude FROM location")
-            return cursor.fetchall()
+            cursor = connection.cursor()
+            collect_search_demand(cursor)
+            connection.commit()
+            return due_locations(cursor, limit=limit, everything=everything)
         except Error as e:
-            print(f"Error getting locations: {e}")
+            print(f"Error getting due locations: {e}")
             return []
         finally:
             cursor.close()
             connection.close()
     return []
 
-def update_location_coordinates(location_id: int, latitude: float, longitude: float):
-    """Update location coordinates in database"""
-    connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor()
-            cursor.execute('''
-                UPDATE location 
-                SET latitude = %s, longitude = %s
-                WHERE id = %s
-            ''', (latitude, longitude, location_id))
-            connection.commit()
-            print(f"Updated coordinates for location ID {location_id}")
-        except Error as e:
-            print(f"Error updating coordinates: {e}")
-        finally:
-            cursor.close()
-            connection.close()
+WEATHER_INSERT_SQL = '''
+    INSERT INTO weather_data 
+    (id, location_id, temperature, feelsLike, maxTemp, minTemp, pressure, humidity,
+    windSpeed, windDeg, windGust, icon, timeZone, cloud, visibility,
+    sunrise, sunset, description, main, updatedAt)
+    VALUES (NULL, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+'''
 
-def save_weather_data(location_id: int, weather_data: dict):
-    """Save current weather data to database"""
-    connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor()
-            cursor.execute('''
-                INSERT INTO weather_data 
-                (id, location_id, temperature, feelsLike, maxTemp, minTemp, pressure, humidity,
-                windSpeed, windDeg, windGust, icon, timeZone, cloud, visibility,
-                sunrise, sunset, description, main, updatedAt)
-                VALUES (NULL, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                location_id,
-                weather_data['main']['temp'],
-                weather_data['main']['feels_like'],
-                weather_data['main']['temp_max'],
-                weather_data['main']['temp_min'],
-                weather_data['main']['pressure'],
-                weather_data['main']['humidity'],
-                weather_data['wind']['speed'],
-                weather_data['wind']['deg'],
-                weather_data['wind'].get('gust', 0),
-                weather_data['weather'][0]['icon'],
-                weather_data['timezone'],
-                weather_data['clouds']['all'],
-                weather_data['visibility'],
-                weather_data['sys']['sunrise'],
-                weather_data['sys']['sunset'],
-                weather_data['weather'][0]['description'],
-                weather_data['weather'][0]['main'],
-                datetime.now().isoformat()
-            ))
-            connection.commit()
-            return cursor.lastrowid
-        except Error as e:
-            print(f"Error saving weather data: {e}")
-            return None
-        finally:
-            cursor.close()
-            connection.close()
-    return None
+def build_weather_row(location_id: int, weather_data: dict) -> tuple:
+    """Convert a current weather response into a weather_data row"""
+    return (
+        location_id,
+        weather_data['main']['temp'],
+        weather_data['main']['feels_like'],
+        weather_data['main']['temp_max'],
+        weather_data['main']['temp_min'],
+        weather_data['main']['pressure'],
+        weather_data['main']['humidity'],
+        weather_data['wind']['speed'],
+        weather_data['wind']['deg'],
+        weather_data['wind'].get('gust', 0),
+        weather_data['weather'][0]['icon'],
+        weather_data['timezone'],
+        weather_data['clouds']['all'],
+        weather_data['visibility'],
+        weather_data['sys']['sunrise'],
+        weather_data['sys']['sunset'],
+        weather_data['weather'][0]['description'],
+        weather_data['weather'][0]['main'],
+        datetime.now().isoformat()
+    )
 
-def save_hourly_forecast(location_id: int, forecast_data: list):
-    """Save hourly forecast data to database"""
-    connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor()
-            # Clear existing hourly data for this location
-            cursor.execute("DELETE FROM hourly_data WHERE location_id = %s", (location_id,))
-            
-            # Insert new hourly data
-            for item in forecast_data[:24]:  # Only save next 24 hours
-                cursor.execute('''
-                    INSERT INTO hourly_data 
-                    (id, location_id, time, temperatureMax, temperatureMin, humidity, icon)
-                    VALUES (NULL, %s, %s, %s, %s, %s, %s)
-                ''', (
-                    location_id,
-                    item['dt'],
-                    item['main']['temp_max'],
-                    item['main']['temp_min'],
-                    item['main']['humidity'],
-                    item['weather'][0]['icon']
-                ))
-            connection.commit()
-        except Error as e:
-            print(f"Error saving hourly forecast: {e}")
-        finally:
-            cursor.close()
-            connection.close()
+HOURLY_INSERT_SQL = '''
+    INSERT INTO hourly_data 
+    (id, location_id, time, temperatureMax, temperatureMin, humidity, icon)
+    VALUES (NULL, %s, %s, %s, %s, %s, %s)
+'''
+
+DAILY_INSERT_SQL = '''
+    INSERT INTO daily_data 
+    (id, location_id, time, temperatureMax, temperatureMin, humidity, icon)
+    VALUES (NULL, %s, %s, %s, %s, %s, %s)
+'''
 
-def save_daily_forecast(location_id: int, forecast_data: list):
-    """Save daily forecast data to database"""
+def build_hourly_rows(location_id: int, forecast_data: list) -> list[tuple]:
+    """Convert forecast items into hourly_data rows"""
+    return [(
+        location_id,
+        item['dt'],
+        item['main']['temp_max'],
+        item['main']['temp_min'],
+        item['main']['humidity'],
+        item['weather'][0]['icon']
+    ) for item in forecast_data[:24]]  # Only save next 24 hours
+
+def build_daily_rows(location_id: int, forecast_data: list) -> list[tuple]:
+    """Group forecast items by day and convert them into daily_data rows"""
+    daily_forecasts = {}
+    for item in forecast_data:
+        # Convert timestamp to date
+        date = datetime.fromtimestamp(item['dt']).date()
+        if date not in daily_forecasts:
+            daily_forecasts[date] = {
+                'temp_max': item['main']['temp_max'],
+                'temp_min': item['main']['temp_min'],
+                'humidity': item['main']['humidity'],
+                'icon': item['weather'][0]['icon'],
+                'dt': item['dt']
+            }
+        else:
+            # Update max/min temperatures
+            daily_forecasts[date]['temp_max'] = max(daily_forecasts[date]['temp_max'], item['main']['temp_max'])
+            daily_forecasts[date]['temp_min'] = min(daily_forecasts[date]['temp_min'], item['main']['temp_min'])
+
+    return [(
+        location_id,
+        forecast['dt'],
+        forecast['temp_max'],
+        forecast['temp_min'],
+        forecast['humidity'],
+        forecast['icon']
+    ) for forecast in daily_forecasts.values()]
+
+def replace_rows(cursor, table: str, insert_sql: str, location_ids: list[int], rows: list[tuple]):
+    """Replace forecast rows of the given locations with one DELETE and one bulk INSERT"""
+    if not location_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(location_ids))
+    cursor.execute(f"DELETE FROM {table} WHERE location_id IN ({placeholders})", tuple(location_ids))
+    if rows:
+        # mysql.connector rewrites executemany INSERTs into a single multi-row statement
+        cursor.executemany(insert_sql, rows)
+
+@dataclass
+class LocationRefresh:
+    """Everything fetched for one location during a refresh"""
+    location_id: int
+    coordinates: tuple[float, float] | None = None
+    weather_data: dict | None = None
+    forecast_data: list | None = None
+    # Per-day items when the provider reports them; otherwise days are derived from forecast_data
+    daily_data: list | None = None
+    # Demand at planning time; decides when the next refresh is due
+    demand: float = 0.0
+
+def bump_generation(cursor, location_ids: list[int]) -> int:
+    """Advance the global data generation and stamp it on the refreshed locations"""
+    # LAST_INSERT_ID(expr) hands the new counter value back on this connection only
+    cursor.execute("UPDATE data_generation SET generation = LAST_INSERT_ID(generation + 1) WHERE location_id = 0")
+    cursor.execute("SELECT LAST_INSERT_ID()")
+    generation = cursor.fetchone()[0]
+    cursor.executemany('''
+        INSERT INTO data_generation (location_id, generation) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE generation = VALUES(generation)
+    ''', [(location_id, generation) for location_id in location_ids])
+    return generation
+
+def save_location_refreshes(refreshes: list[LocationRefresh]) -> bool:
+    """Persist coordinates, current weather and forecasts of the given locations in one transaction"""
+    refreshes = [refresh for refresh in refreshes
+                 if refresh.coordinates or refresh.weather_data or refresh.forecast_data is not None]
+    if not refreshes:
+        return True
     connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor()
-            # Clear existing daily data for this location
-            cursor.execute("DELETE FROM daily_data WHERE location_id = %s", (location_id,))
-            
-            # Group forecast data by day
-            daily_forecasts = {}
-            for item in forecast_data:
-                # Convert timestamp to date
-                date = datetime.fromtimestamp(item['dt']).date()
-                if date not in daily_forecasts:
-                    daily_forecasts[date] = {
-                        'temp_max': item['main']['temp_max'],
-                        'temp_min': item['main']['temp_min'],
-                        'humidity': item['main']['humidity'],
-                        'icon': item['weather'][0]['icon'],
-                        'dt': item['dt']
-                    }
-                else:
-                    # Update max/min temperatures
-                    daily_forecasts[date]['temp_max'] = max(daily_forecasts[date]['temp_max'], item['main']['temp_max'])
-                    daily_forecasts[date]['temp_min'] = min(daily_forecasts[date]['temp_min'], item['main']['temp_min'])
-            
-            # Insert daily data
-            for date, forecast in daily_forecasts.items():
-                cursor.execute('''
-                    INSERT INTO daily_data 
-                    (id, location_id, time, temperatureMax, temperatureMin, humidity, icon)
-                    VALUES (NULL, %s, %s, %s, %s, %s, %s)
-                ''', (
-                    location_id,
-                    forecast['dt'],
-                    forecast['temp_max'],
-                    forecast['temp_min'],
-                    forecast['humidity'],
-                    forecast['icon']
-                ))
-            connection.commit()
-        except Error as e:
-            print(f"Error saving daily forecast: {e}")
-        finally:
-            cursor.close()
-            connection.close()
+    if not connection:
+        return False
+    try:
+        cursor = connection.cursor()
+        coordinate_rows = [(*refresh.coordinates, refresh.location_id)
+                           for refresh in refreshes if refresh.coordinates]
+        if coordinate_rows:
+            cursor.executemany("UPDATE location SET latitude = %s, longitude = %s WHERE id = %s", coordinate_rows)
+
+        weather_rows = [build_weather_row(refresh.location_id, refresh.weather_data)
+                        for refresh in refreshes if refresh.weather_data]
+        if weather_rows:
+            cursor.executemany(WEATHER_INSERT_SQL, weather_rows)
+
+        forecasts = {refresh.location_id: refresh.forecast_data
+                     for refresh in refreshes if refresh.forecast_data is not None}
+        replace_rows(cursor, 'hourly_data', HOURLY_INSERT_SQL, list(forecasts),
+                     [row for location_id, forecast_data in forecasts.items()
+                      for row in build_hourly_rows(location_id, forecast_data)])
+        daily = {refresh.location_id: refresh.daily_data if refresh.daily_data is not None else refresh.forecast_data
+                 for refresh in refreshes if refresh.forecast_data is not None}
+        replace_rows(cursor, 'daily_data', DAILY_INSERT_SQL, list(daily),
+                     [row for location_id, daily_data in daily.items()
+                      for row in build_daily_rows(location_id, daily_data)])
+
+        bump_generation(cursor, [refresh.location_id for refresh in refreshes])
+        # Only complete refreshes are rescheduled; partial ones stay due and are retried next run
+        mark_refreshed(cursor, {refresh.location_id: refresh.demand for refresh in refreshes
+                                if refresh.weather_data and refresh.forecast_data is not None})
+
+        # Readers either see the previous refresh or this one, never a mix
+        connection.commit()
+        return True
+    except Error as e:
+        connection.rollback()
+        print(f"Error saving location refresh: {e}")
+        return False
+    finally:
+        cursor.close()
+        connection.close()
+
+def save_location_refresh(refresh: LocationRefresh) -> bool:
+    """Persist one location's refresh as a single unit of work"""
+    return save_location_refreshes([refresh])
 
 def test_api_key(api_key: str) -> bool:
     """Test if the API key is valid by making a simple request"""
-    test_url = f"https://api.openweathermap.org/data/2.5/weather?q=London&appid={api_key}"
     try:
-        response = requests.get(test_url)
+        response = get_client().get(f"{OPENWEATHER_BASE_URL}/data/2.5/weather", params={'q': 'London', 'appid': api_key})
         if response.status_code == 200:
             print("API key is valid!")
             return True
@@ -203,81 +255,181 @@ def test_api_key(api_key: str) -> bool:
         print(f"Error testing API key: {e}")
         return False
 
-def fetch_weather_data():
-    """Fetch weather data for all locations and save to database"""
-    api_key = get_api_key()
-    if not api_key:
-        print("Error: OpenWeather API key not found")
-        return
+def retry_after_seconds(response: httpx.Response) -> float | None:
+    """Parse a Retry-After header given either in seconds or as an HTTP date"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
 
-    locations = get_locations()
-    if not locations:
-        print("No locations found in database")
-        return
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff, so retrying workers do not hit the API in lockstep"""
+    return random.uniform(0, min(INGEST_BACKOFF_MAX, INGEST_BACKOFF_BASE * 2 ** attempt))
+
+def retry_delay(limiter: AdaptiveRateLimiter, attempt: int, error: Exception) -> float | None:
+    """How long to wait before retrying a failed GET, or None if it should not be retried"""
+    if isinstance(error, httpx.TransportError):
+        # Timeouts and dropped connections
+        return backoff_delay(attempt)
+    if isinstance(error, httpx.HTTPStatusError) and error.response.status_code in RETRY_STATUSES:
+        retry_after = retry_after_seconds(error.response)
+        if error.response.status_code == 429:
+            limiter.throttled(retry_after)
+        return max(retry_after or 0.0, backoff_delay(attempt))
+    return None
 
-    for location in locations:
-        print(f"Fetching weather data for {location['name']}...")
-        
-        # If location doesn't have coordinates, fetch them first
-        if location['latitude'] is None or location['longitude'] is None:
-            try:
-                # Use OpenWeather Geocoding API to get coordinates
-                geocode_url = f"https://api.openweathermap.org/geo/1.0/direct?q={location['name']}&limit=1&appid={api_key}"
-                response = requests.get(geocode_url)
-                response.raise_for_status()
-                geocode_data = response.json()
-                
-                if geocode_data:
-                    lat = geocode_data[0]['lat']
-                    lon = geocode_data[0]['lon']
-                    update_location_coordinates(location['id'], lat, lon)
-                    location['latitude'] = lat
-                    location['longitude'] = lon
-                    print(f"Updated coordinates for {location['name']}: {lat}, {lon}")
-                else:
-                    print(f"Could not find coordinates for {location['name']}")
-                    continue
-            except Exception as e:
-                print(f"Error fetching coordinates for {location['name']}: {e}")
-                continue
-        
-        # Fetch current weather
-        current_url = f"https://api.openweathermap.org/data/2.5/weather?lat={location['latitude']}&lon={location['longitude']}&appid={api_key}&units=metric"
+async def fetch_json_async(client: httpx.AsyncClient, limiter: AdaptiveRateLimiter, path: str, params: dict):
+    """Issue a rate-limited GET against the OpenWeather API, retrying throttled and failed calls"""
+    for attempt in range(INGEST_MAX_RETRIES + 1):
+        await limiter.acquire()
         try:
-            response = requests.get(current_url)
+            response = await client.get(f"{OPENWEATHER_BASE_URL}{path}", params=params)
             response.raise_for_status()
-            weather_data = response.json()
-            weather_data_id = save_weather_data(location['id'], weather_data)
-            print(f"Current weather data saved for {location['name']}")
-        except Exception as e:
-            print(f"Error fetching current weather for {location['name']}: {e}")
-            if hasattr(e, 'response'):
-                print(f"Response status: {e.response.status_code}")
-                print(f"Response text: {e.response.text}")
+        except httpx.HTTPError as e:
+            delay = retry_delay(limiter, attempt, e)
+            if delay is None or attempt == INGEST_MAX_RETRIES:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        limiter.succeeded()
+        return response.json()
+
+async def fetch_bundle_async(client: httpx.AsyncClient, limiter: AdaptiveRateLimiter, provider: FallbackProvider,
+                             api_key: str, location: dict) -> tuple[WeatherBundle, bool]:
+    """Fetch a location's weather through the active provider; False if any of its calls failed"""
+    while True:
+        active = provider.active
+        calls = active.requests(location['latitude'], location['longitude'], api_key)
+        # The calls of one provider are independent, so request them in parallel
+        results = await asyncio.gather(*(fetch_json_async(client, limiter, path, params) for path, params in calls),
+                                       return_exceptions=True)
+        errors = [(path, result) for (path, _), result in zip(calls, results) if isinstance(result, Exception)]
+        if any(provider.unsupported(active, error) for _, error in errors):
+            provider.fall_back(active)
             continue
+        for path, error in errors:
+            print(f"Error fetching {path} for {location['name']}: {error}")
+        return active.normalize([None if isinstance(result, Exception) else result for result in results]), not errors
 
-        # Fetch 5-day forecast
-        forecast_url = f"https://api.openweathermap.org/data/2.5/forecast?lat={location['latitude']}&lon={location['longitude']}&appid={api_key}&units=metric"
+async def refresh_location_async(client: httpx.AsyncClient, limiter: AdaptiveRateLimiter, provider: FallbackProvider,
+                                 api_key: str, location: dict, save=save_location_refresh) -> bool:
+    """Fetch and save current weather and forecast for one location"""
+    print(f"Fetching weather data for {location['name']}...")
+    refresh = LocationRefresh(location['id'], demand=location.get('demand', 0.0))
+
+    # If location doesn't have coordinates, fetch them first
+    if location['latitude'] is None or location['longitude'] is None:
         try:
-            response = requests.get(forecast_url)
-            response.raise_for_status()
-            forecast_data = response.json()
-            
-            # Save hourly forecast
-            save_hourly_forecast(location['id'], forecast_data['list'])
-            print(f"Hourly forecast saved for {location['name']}")
-            
-            # Save daily forecast (using the same data)
-            save_daily_forecast(location['id'], forecast_data['list'])
-            print(f"Daily forecast saved for {location['name']}")
+            geocode_data = await fetch_json_async(client, limiter, "/geo/1.0/direct", {
+                'q': location['name'], 'limit': 1, 'appid': api_key
+            })
         except Exception as e:
-            print(f"Error fetching forecast for {location['name']}: {e}")
-            if hasattr(e, 'response'):
-                print(f"Response status: {e.response.status_code}")
-                print(f"Response text: {e.response.text}")
+            print(f"Error fetching coordinates for {location['name']}: {e}")
+            return False
+        if not geocode_data:
+            print(f"Could not find coordinates for {location['name']}")
+            return False
+        location['latitude'] = geocode_data[0]['lat']
+        location['longitude'] = geocode_data[0]['lon']
+        refresh.coordinates = (location['latitude'], location['longitude'])
+        print(f"Found coordinates for {location['name']}: {location['latitude']}, {location['longitude']}")
+
+    bundle, success = await fetch_bundle_async(client, limiter, provider, api_key, location)
+    refresh.weather_data, refresh.forecast_data, refresh.daily_data = bundle.current, bundle.forecast, bundle.daily
 
-        # Add delay to avoid hitting API rate limits
-        time.sleep(1)
+    # Coordinates, current weather and forecast are committed together
+    if not await asyncio.to_thread(save, refresh):
+        return False
+    if success:
+        print(f"Weather data saved for {location['name']}")
+    return success
+
+async def fetch_weather_data_async(concurrency: int = INGEST_CONCURRENCY,
+                                   calls_per_minute: int = OPENWEATHER_CALLS_PER_MINUTE,
+                                   locations: list[dict] | None = None, api_key: str | None = None,
+                                   save=save_location_refresh, limit: int | None = None,
+                                   everything: bool = False, provider: str = OPENWEATHER_PROVIDER) -> dict | None:
+    """Fetch weather data for all locations concurrently, paced by the API quota"""
+    api_key = api_key or get_api_key()
+    if not api_key:
+        print("Error: OpenWeather API key not found")
+        return None
+
+    if locations is None:
+        locations = await asyncio.to_thread(get_due_locations, limit, everything)
+    if not locations:
+        print("No locations due for a refresh")
+        return None
+
+    # The limiter paces requests to the plan quota and backs off on 429; the queue bounds in-flight locations
+    limiter = AdaptiveRateLimiter.per_minute(calls_per_minute)
+    provider = create_provider(provider)
+    refreshed = 0
+    started = time.monotonic()
+    pending = locations
+
+    async with create_async_client(concurrency) as client:
+        # Locations that still failed after their retries go round again once the rest are done
+        for round_number in range(INGEST_REQUEUE_ROUNDS + 1):
+            if round_number:
+                print(f"Retrying {len(pending)} failed locations...")
+            queue: asyncio.Queue = asyncio.Queue()
+            for location in pending:
+                queue.put_nowait(location)
+            failed = []
+
+            async def worker():
+                nonlocal refreshed
+                while True:
+                    try:
+                        location = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    if await refresh_location_async(client, limiter, provider, api_key, location, save):
+                        refreshed += 1
+                    else:
+                        failed.append(location)
+
+            await asyncio.gather(*(worker() for _ in range(min(concurrency, len(pending)))))
+            pending = failed
+            if not pending:
+                break
+
+    elapsed = time.monotonic() - started
+    print(f"Refreshed {refreshed}/{len(locations)} locations in {elapsed:.1f}s")
+    return {'refreshed': refreshed, 'locations': len(locations), 'elapsed': elapsed}
+
+def fetch_weather_data(limit: int | None = None, everything: bool = False,
+                       calls_per_minute: int = OPENWEATHER_CALLS_PER_MINUTE, provider: str = OPENWEATHER_PROVIDER):
+    """Fetch weather data for the locations due for a refresh one at a time and save to database"""
+    # The async ingester with a single worker, so retries, providers and saves have one implementation
+    return asyncio.run(fetch_weather_data_async(1, calls_per_minute, limit=limit, everything=everything,
+                                                provider=provider))
 
 if __name__ == "__main__":
-    fetch_weather_data() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fetch OpenWeather data for all stored locations")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="refresh locations concurrently instead of one by one")
+    parser.add_argument('--concurrency', type=int, default=INGEST_CONCURRENCY,
+                        help="number of locations refreshed at the same time in async mode")
+    parser.add_argument('--calls-per-minute', type=int, default=OPENWEATHER_CALLS_PER_MINUTE,
+                        help="OpenWeather plan quota used to pace requests")
+    parser.add_argument('--limit', type=int,
+                        help="refresh at most this many due locations, most requested first")
+    parser.add_argument('--all', dest='everything', action='store_true',
+                        help="refresh every location, not only the ones that are due")
+    parser.add_argument('--provider', choices=['auto', *PROVIDERS], default=OPENWEATHER_PROVIDER,
+                        help="weather endpoints to use; auto tries One Call and falls back to /weather + /forecast")
+    args = parser.parse_args()
+
+    if args.use_async:
+        asyncio.run(fetch_weather_data_async(args.concurrency, args.calls_per_minute,
+                                             limit=args.limit, everything=args.everything, provider=args.provider))
+    else:
+        fetch_weather_data(args.limit, args.everything, args.calls_per_minute, args.provider)
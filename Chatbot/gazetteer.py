@@ -0,0 +1,158 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+
+from background import PeriodicTask
+from db_pool import db_cursor
+from spatial_index import SpatialIndex
+
+# Common alternative spellings, keyed by the compact key of the canonical name
+ALIASES = {
+    'hochiminhcity': ['ho chi minh', 'sai gon', 'saigon', 'tp hcm', 'tphcm', 'hcm', 'thanh pho ho chi minh'],
+    'hanoi': ['thu do ha noi', 'thanh pho ha noi', 'hn'],
+    'danang': ['thanh pho da nang'],
+    'newyork': ['new york city', 'nyc'],
+    'tokyo': ['tokio'],
+    'moscow': ['moskva'],
+}
+
+def fold_accents(text: str) -> str:
+    """Strip diacritics, including the Vietnamese đ"""
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def normalize_place_name(text: str) -> str:
+    """Lower-case, accent-fold and collapse punctuation and whitespace"""
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', fold_accents(text).lower()).split())
+
+def compact_key(text: str) -> str:
+    """Normalized name without spaces, so "Ha Noi", "Hanoi" and "Hà Nội" share one key"""
+    return normalize_place_name(text).replace(' ', '')
+
+@dataclass
+class Place:
+    name: str
+    latitude: float
+    longitude: float
+    location_id: int | None = None
+
+class Gazetteer:
+    """In-memory place name index backed by the location and search_history tables"""
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._places: dict[str, Place] = {}
+        self._trie: dict = {}
+        # Stored locations by position, for resolving coordinates to a location id
+        self.locations = SpatialIndex()
+        self._last_location_id = 0
+        self._last_searched_at = ''
+        # Locations without coordinates yet; fetch_weather_data geocodes them later
+        self._pending_ids: set[int] = set()
+        self._refresher = PeriodicTask(self.refresh, refresh_interval, 'refreshing gazetteer')
+
+    def __len__(self):
+        return len(self._places)
+
+    def _index(self, key: str, place: Place):
+        if not key:
+            return
+        node = self._trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[''] = key
+        self._places[key] = place
+
+    def add(self, place: Place, authoritative: bool = True):
+        """Index a place under its name and aliases"""
+        key = compact_key(place.name)
+        # Rows from the location table win over names typed into the app search box
+        if not authoritative and key in self._places:
+            return
+        self._index(key, place)
+        if place.location_id is not None:
+            self.locations.insert(place.location_id, place.latitude, place.longitude)
+        for alias in ALIASES.get(key, []):
+            self._index(compact_key(alias), place)
+
+    def lookup(self, name: str, prefix: bool = True) -> Place | None:
+        """Resolve a free-text place name by exact key or alias, then (unless prefix=False) by unambiguous prefix"""
+        key = compact_key(name)
+        if not key:
+            return None
+        place = self._places.get(key)
+        if place is not None or not prefix:
+            return place
+        matches = self.complete(key, limit=2)
+        if len(matches) == 1:
+            return matches[0]
+        return None
+
+    def places_in_text(self, text: str, max_words: int = 5) -> list[Place]:
+        """Every known place named in a sentence, longest names first at each position"""
+        words = normalize_place_name(text).split()
+        places = []
+        start = 0
+        while start < len(words):
+            for size in range(min(max_words, len(words) - start), 0, -1):
+                place = self._places.get(''.join(words[start:start + size]))
+                if place is not None:
+                    if place not in places:
+                        places.append(place)
+                    start += size
+                    break
+            else:
+                start += 1
+        return places
+
+    def complete(self, prefix: str, limit: int = 5) -> list[Place]:
+        """Return places whose key starts with the given prefix"""
+        node = self._trie
+        for char in compact_key(prefix):
+            node = node.get(char)
+            if node is None:
+                return []
+        results = []
+        stack = [node]
+        while stack and len(results) < limit:
+            node = stack.pop()
+            if '' in node:
+                place = self._places[node['']]
+                if place not in results:
+                    results.append(place)
+            stack.extend(child for char, child in node.items() if char)
+        return results
+
+    async def refresh(self):
+        """Load locations and searches added since the previous refresh"""
+        async with db_cursor(dictionary=True) as cursor:
+            pending = tuple(self._pending_ids) or (0,)
+            placeholders = ', '.join(['%s'] * len(pending))
+            await cursor.execute(
+                f"SELECT id, name, latitude, longitude FROM location WHERE id > %s OR id IN ({placeholders})",
+                (self._last_location_id, *pending)
+            )
+            for row in await cursor.fetchall():
+                self._last_location_id = max(self._last_location_id, row['id'])
+                if row['latitude'] is None or row['longitude'] is None:
+                    self._pending_ids.add(row['id'])
+                    continue
+                self._pending_ids.discard(row['id'])
+                self.add(Place(row['name'], row['latitude'], row['longitude'], row['id']))
+
+            await cursor.execute(
+                "SELECT location, lat, lon, searched_at FROM search_history WHERE searched_at > %s ORDER BY searched_at ASC",
+                (self._last_searched_at,)
+            )
+            for row in await cursor.fetchall():
+                self._last_searched_at = row['searched_at']
+                self.add(Place(row['location'], row['lat'], row['lon']), authoritative=False)
+
+    def start(self):
+        """Load the index and keep refreshing it in the background"""
+        self._refresher.start()
+
+    async def stop(self):
+        """Stop the background refresh"""
+        await self._refresher.stop()
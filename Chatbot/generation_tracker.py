@@ -0,0 +1,54 @@
+from typing import Callable
+
+from background import PeriodicTask
+from db_pool import db_cursor
+
+GLOBAL_GENERATION_ID = 0
+
+class GenerationTracker:
+    """Follow the data generation bumped by fetch_weather_data and notify subscribers of refreshed locations"""
+
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        self.generation = 0
+        self._locations: dict[int, int] = {}
+        self._subscribers: list[Callable[[int], None]] = []
+        self._poller = PeriodicTask(self.poll, poll_interval, 'polling data generation')
+        self._initialized = False
+
+    def subscribe(self, callback: Callable[[int], None]):
+        """Call callback(location_id) whenever a location gets fresh data"""
+        self._subscribers.append(callback)
+
+    def generation_of(self, location_id: int) -> int:
+        """Return the last known generation of a location (0 if never refreshed)"""
+        return self._locations.get(location_id, 0)
+
+    async def poll(self):
+        """Fetch generations newer than the last seen one and notify subscribers"""
+        async with db_cursor() as cursor:
+            # Seeks idx_data_generation_generation, so an idle poll reads nothing
+            await cursor.execute(
+                "SELECT location_id, generation FROM data_generation WHERE generation > %s",
+                (self.generation,)
+            )
+            rows = await cursor.fetchall()
+
+        for location_id, generation in rows:
+            if location_id == GLOBAL_GENERATION_ID:
+                self.generation = max(self.generation, generation)
+                continue
+            self._locations[location_id] = generation
+            # The first poll only takes a snapshot; nothing cached can predate it
+            if self._initialized:
+                for callback in self._subscribers:
+                    callback(location_id)
+        self._initialized = True
+
+    def start(self):
+        """Start polling in the background"""
+        self._poller.start()
+
+    async def stop(self):
+        """Stop the background poller"""
+        await self._poller.stop()
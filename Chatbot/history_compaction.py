@@ -0,0 +1,97 @@
+from dataclasses import replace
+
+from pydantic_ai.messages import (
+    ModelMessage, ModelRequest, SystemPromptPart, TextPart, ToolReturnPart, UserPromptPart,
+)
+
+from conversation_store import estimate_tokens, is_turn_start
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+def split_turns(messages: list[ModelMessage]) -> list[list[ModelMessage]]:
+    """Group messages into turns, each starting with a user prompt"""
+    turns: list[list[ModelMessage]] = []
+    for message in messages:
+        if is_turn_start(message) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+def _shorten(text: str, limit: int) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+def _pop_summary(turn: list[ModelMessage]) -> tuple[str, list[ModelMessage]]:
+    """Remove a previously inserted summary from the first request of a turn"""
+    first = turn[0]
+    if not isinstance(first, ModelRequest):
+        return '', turn
+    summaries = [part for part in first.parts
+                 if isinstance(part, SystemPromptPart) and part.content.startswith(SUMMARY_PREFIX)]
+    if not summaries:
+        return '', turn
+    parts = [part for part in first.parts if part not in summaries]
+    return summaries[0].content[len(SUMMARY_PREFIX):], [replace(first, parts=parts), *turn[1:]]
+
+def summarize_turn(turn: list[ModelMessage], line_chars: int) -> str:
+    """Collapse a turn into the user's question and the assistant's final answer"""
+    question = ''
+    answer = ''
+    for message in turn:
+        for part in message.parts:
+            if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                question = part.content
+            elif isinstance(part, TextPart):
+                answer = part.content
+    lines = []
+    if question:
+        lines.append(f"- User: {_shorten(question, line_chars)}")
+    if answer:
+        lines.append(f"  Assistant: {_shorten(answer, line_chars)}")
+    return '\n'.join(lines)
+
+def _trim_tool_returns(turn: list[ModelMessage], max_chars: int) -> list[ModelMessage]:
+    """Shorten verbose tool results of a turn that has already been answered"""
+    trimmed = []
+    for message in turn:
+        if isinstance(message, ModelRequest) and any(isinstance(part, ToolReturnPart) for part in message.parts):
+            parts = [
+                replace(part, content=_shorten(part.model_response_str(), max_chars))
+                if isinstance(part, ToolReturnPart) else part
+                for part in message.parts
+            ]
+            message = replace(message, parts=parts)
+        trimmed.append(message)
+    return trimmed
+
+def compact_history(messages: list[ModelMessage], keep_turns: int, token_budget: int,
+                    summary_max_chars: int, tool_result_max_chars: int) -> list[ModelMessage]:
+    """Keep the last turns verbatim and fold older ones into a rolling summary within a token budget"""
+    turns = split_turns(messages)
+    if not turns:
+        return messages
+    summary, turns[0] = _pop_summary(turns[0])
+
+    # Tool payloads only matter for the turn that requested them
+    turns = [_trim_tool_returns(turn, tool_result_max_chars) for turn in turns[:-1]] + [turns[-1]]
+
+    keep_turns = max(1, keep_turns)
+    older, recent = turns[:-keep_turns], turns[-keep_turns:]
+    line_chars = max(80, summary_max_chars // 10)
+    summary_lines = [summary] if summary else []
+    summary_lines += [summarize_turn(turn, line_chars) for turn in older]
+
+    # Fold more turns into the summary until the verbatim part fits the budget
+    while len(recent) > 1 and sum(estimate_tokens(m) for turn in recent for m in turn) > token_budget:
+        summary_lines.append(summarize_turn(recent.pop(0), line_chars))
+
+    summary = '\n'.join(line for line in summary_lines if line)
+    if len(summary) > summary_max_chars:
+        # Rolling summary: the oldest details are dropped first
+        summary = summary[-summary_max_chars:].split('\n', 1)[-1]
+
+    compacted = [message for turn in recent for message in turn]
+    if summary and compacted and isinstance(compacted[0], ModelRequest):
+        first = compacted[0]
+        compacted[0] = replace(first, parts=[SystemPromptPart(content=SUMMARY_PREFIX + summary), *first.parts])
+    return compacted
@@ -0,0 +1,39 @@
+import importlib.util
+
+import httpx
+
+from config import OPENWEATHER_CONNECT_TIMEOUT, OPENWEATHER_READ_TIMEOUT, OPENWEATHER_HTTP2, INGEST_CONCURRENCY
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+_client: httpx.Client | None = None
+
+def client_options(max_connections: int) -> dict:
+    """Settings shared by the sync and async OpenWeather clients"""
+    return {
+        'http2': OPENWEATHER_HTTP2 and HTTP2_AVAILABLE,
+        # Without a timeout a hung socket would block the ingester forever
+        'timeout': httpx.Timeout(OPENWEATHER_READ_TIMEOUT, connect=OPENWEATHER_CONNECT_TIMEOUT),
+        # Idle connections stay open so later calls skip the TCP and TLS handshakes
+        'limits': httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        'headers': {'Accept-Encoding': 'gzip, deflate'},
+    }
+
+def get_client() -> httpx.Client:
+    """Process-wide blocking client, created on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.Client(**client_options(max_connections=4))
+    return _client
+
+def close_client():
+    """Close the blocking client and its pooled connections"""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+def create_async_client(concurrency: int = INGEST_CONCURRENCY) -> httpx.AsyncClient:
+    """Async client sized for concurrency locations with parallel current/forecast calls"""
+    return httpx.AsyncClient(**client_options(max_connections=concurrency * 2))
@@ -0,0 +1,269 @@
+import argparse
+import asyncio
+import heapq
+import json
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from config import (
+    INGEST_CONCURRENCY, OPENWEATHER_CALLS_PER_MINUTE, INGEST_HEALTH_HOST, INGEST_HEALTH_PORT,
+    INGEST_RELOAD_INTERVAL, INGEST_RETRY_DELAY, INGEST_SHUTDOWN_TIMEOUT, OPENWEATHER_PROVIDER,
+)
+from fetch_weather_data import get_api_key, get_due_locations, open_db_pool, refresh_location_async
+from http_client import create_async_client
+from rate_limiter import AdaptiveRateLimiter
+from refresh_scheduler import due_at, refresh_interval
+from weather_providers import FallbackProvider, create_provider
+
+# mysql.connector refuses pools larger than this
+MAX_DB_POOL_SIZE = 32
+
+class IngestionService:
+    """Keep every location refreshed on its own schedule instead of in periodic full runs"""
+
+    def __init__(self, concurrency: int, calls_per_minute: int, reload_interval: float, retry_delay: float):
+        self.concurrency = concurrency
+        self.calls_per_minute = calls_per_minute
+        self.reload_interval = reload_interval
+        self.retry_delay = retry_delay
+        # (due time, -demand, location_id); superseded entries are skipped when popped
+        self._heap: list[tuple[float, float, int]] = []
+        self._keys: dict[int, tuple[float, float]] = {}
+        self._locations: dict[int, dict] = {}
+        self._in_flight: dict[int, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._slots = asyncio.Semaphore(concurrency)
+        self.started_at = time.time()
+        self.last_reload_at: float | None = None
+        self.last_refresh_at: float | None = None
+        self.refreshed = 0
+        self.failed = 0
+
+    def schedule(self, location: dict, when: float):
+        """Queue a location for refresh at the given time, replacing any earlier entry"""
+        key = (when, -location.get('demand', 0.0))
+        self._locations[location['id']] = location
+        # Reloads reschedule every location; an unchanged key already has a live heap entry
+        if self._keys.get(location['id']) == key:
+            return
+        self._keys[location['id']] = key
+        heapq.heappush(self._heap, (*key, location['id']))
+        # Superseded entries are otherwise only dropped when they reach the top
+        if len(self._heap) > 2 * len(self._keys):
+            self._heap = [(*key, location_id) for location_id, key in self._keys.items()]
+            heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def _peek(self) -> tuple[float, int] | None:
+        """Earliest live (due time, location_id), dropping superseded heap entries"""
+        while self._heap:
+            when, priority, location_id = self._heap[0]
+            if self._keys.get(location_id) == (when, priority):
+                return when, location_id
+            heapq.heappop(self._heap)
+        return None
+
+    def _pop(self, location_id: int) -> dict:
+        heapq.heappop(self._heap)
+        del self._keys[location_id]
+        return self._locations[location_id]
+
+    async def reload(self):
+        """Pick up new locations and demand changes from the database"""
+        locations = await asyncio.to_thread(get_due_locations, None, True)
+        if not locations:
+            return
+        seen = set()
+        for location in locations:
+            seen.add(location['id'])
+            if location['id'] in self._in_flight:
+                continue
+            known = self._locations.get(location['id'])
+            if known is not None and known['latitude'] is not None:
+                # Keep coordinates geocoded by an earlier refresh that the row may not show yet
+                location['latitude'], location['longitude'] = known['latitude'], known['longitude']
+            self.schedule(location, due_at(location))
+        for location_id in set(self._keys) - seen:
+            # Deleted locations: their heap entries become stale and are skipped
+            del self._keys[location_id]
+            self._locations.pop(location_id, None)
+        self.last_reload_at = time.time()
+
+    async def _reload_loop(self):
+        while True:
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"Error reloading refresh schedule: {e}")
+            await asyncio.sleep(self.reload_interval)
+
+    async def _refresh(self, client: httpx.AsyncClient, limiter: AdaptiveRateLimiter, provider: FallbackProvider,
+                       api_key: str, location: dict):
+        try:
+            success = await refresh_location_async(client, limiter, provider, api_key, location)
+        except Exception as e:
+            print(f"Error refreshing {location['name']}: {e}")
+            success = False
+        finally:
+            self._slots.release()
+            self._in_flight.pop(location['id'], None)
+
+        now = time.time()
+        if success:
+            self.refreshed += 1
+            self.last_refresh_at = now
+            # Matches the next_due_at that save_location_refresh just stored
+            next_refresh = now + refresh_interval(location.get('demand', 0.0))
+        else:
+            self.failed += 1
+            next_refresh = now + self.retry_delay
+        if not self._stopping.is_set() and location['id'] in self._locations:
+            location['last_fetched_at'] = now if success else location.get('last_fetched_at')
+            self.schedule(location, next_refresh)
+
+    async def _dispatch(self, client: httpx.AsyncClient, limiter: AdaptiveRateLimiter, provider: FallbackProvider,
+                        api_key: str):
+        while not self._stopping.is_set():
+            head = self._peek()
+            now = time.time()
+            if head is None or head[0] > now:
+                self._wakeup.clear()
+                delay = self.reload_interval if head is None else head[0] - now
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._slots.acquire()
+            # The heap may have changed while waiting for a slot
+            head = self._peek()
+            if head is None or head[0] > time.time() or self._stopping.is_set():
+                self._slots.release()
+                continue
+            location = self._pop(head[1])
+            self._in_flight[location['id']] = asyncio.create_task(
+                self._refresh(client, limiter, provider, api_key, location)
+            )
+
+    def request_stop(self):
+        """Stop dispatching new refreshes; in-flight ones are allowed to finish"""
+        self._stopping.set()
+        self._wakeup.set()
+
+    def metrics(self) -> dict:
+        head = self._peek()
+        now = time.time()
+        return {
+            'uptime_seconds': round(now - self.started_at, 1),
+            'scheduled_locations': len(self._keys),
+            'in_flight_refreshes': len(self._in_flight),
+            'refreshed_total': self.refreshed,
+            'failed_total': self.failed,
+            # How far behind schedule the most overdue location is
+            'refresh_lag_seconds': round(max(0.0, now - head[0]), 1) if head else 0.0,
+            'last_reload_age_seconds': round(now - self.last_reload_at, 1) if self.last_reload_at else None,
+            'last_refresh_age_seconds': round(now - self.last_refresh_at, 1) if self.last_refresh_at else None,
+        }
+
+    def healthy(self) -> bool:
+        # Unhealthy while stopping, or if the schedule could not be read for several reload intervals
+        if self._stopping.is_set():
+            return False
+        reference = self.last_reload_at or self.started_at
+        return time.time() - reference <= self.reload_interval * 3
+
+    async def _handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer GET /health and GET /metrics"""
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            path = parts[1] if len(parts) > 1 else '/'
+            if path == '/health':
+                ok = self.healthy()
+                status = '200 OK' if ok else '503 Service Unavailable'
+                body = {'status': 'ok' if ok else 'unhealthy'}
+            elif path == '/metrics':
+                status, body = '200 OK', self.metrics()
+            else:
+                status, body = '404 Not Found', {'error': 'not found'}
+            payload = json.dumps(body).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode('latin-1') + payload
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, health_host: str, health_port: int):
+        """Serve until request_stop() is called, then let in-flight refreshes finish"""
+        # Paid once: API key, DB pool, HTTP connections
+        api_key = get_api_key()
+        if not api_key:
+            print("Error: OpenWeather API key not found")
+            return
+        pool_size = min(self.concurrency, MAX_DB_POOL_SIZE)
+        open_db_pool(pool_size)
+        # Saves run on threads; never more at once than there are pooled connections
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='ingestion-db')
+        )
+        limiter = AdaptiveRateLimiter.per_minute(self.calls_per_minute)
+        # Shared so a plan without One Call is detected once, not per location
+        provider = create_provider(OPENWEATHER_PROVIDER)
+        server = await asyncio.start_server(self._handle_http, health_host, health_port)
+        print(f"Ingestion service running; health on http://{health_host}:{health_port}/health")
+
+        async with create_async_client(self.concurrency) as client:
+            reloader = asyncio.create_task(self._reload_loop())
+            try:
+                await self._dispatch(client, limiter, provider, api_key)
+            finally:
+                reloader.cancel()
+                if self._in_flight:
+                    print(f"Waiting for {len(self._in_flight)} in-flight refreshes...")
+                    _, pending = await asyncio.wait(list(self._in_flight.values()), timeout=INGEST_SHUTDOWN_TIMEOUT)
+                    for task in pending:
+                        task.cancel()
+                server.close()
+                await server.wait_closed()
+        print(f"Ingestion service stopped after {self.refreshed} refreshes ({self.failed} failed)")
+
+async def main(args):
+    service = IngestionService(args.concurrency, args.calls_per_minute, args.reload_interval, args.retry_delay)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, service.request_stop)
+        except (NotImplementedError, AttributeError):
+            # Windows has no loop signal handlers; Ctrl+C cancels run() and its cleanup still runs
+            pass
+    await service.run(args.health_host, args.health_port)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident ingestion service that refreshes locations as they fall due")
+    parser.add_argument('--concurrency', type=int, default=INGEST_CONCURRENCY,
+                        help="number of locations refreshed at the same time")
+    parser.add_argument('--calls-per-minute', type=int, default=OPENWEATHER_CALLS_PER_MINUTE,
+                        help="OpenWeather plan quota used to pace requests")
+    parser.add_argument('--reload-interval', type=float, default=INGEST_RELOAD_INTERVAL,
+                        help="seconds between schedule reloads from the database")
+    parser.add_argument('--retry-delay', type=float, default=INGEST_RETRY_DELAY,
+                        help="seconds before a failed location is tried again")
+    parser.add_argument('--health-host', default=INGEST_HEALTH_HOST)
+    parser.add_argument('--health-port', type=int, default=INGEST_HEALTH_PORT)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,132 @@
+import mysql.connector
+from mysql.connector import Error
+
+from config import DB_CONFIG
+
+# Tables added after the initial schema
+TABLES = [
+    ('data_generation', '''
+        CREATE TABLE data_generation(
+            location_id INT PRIMARY KEY,
+            generation BIGINT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_data_generation_generation (generation)
+        )
+    '''),
+    ('location_refresh', '''
+        CREATE TABLE location_refresh(
+            location_id INT PRIMARY KEY,
+            last_fetched_at DOUBLE,
+            next_due_at DOUBLE,
+            demand DOUBLE NOT NULL DEFAULT 0,
+            demand_updated_at DOUBLE NOT NULL DEFAULT 0,
+            INDEX idx_location_refresh_next_due (next_due_at)
+        )
+    '''),
+    ('conversation_state', '''
+        CREATE TABLE conversation_state(
+            conversation_id VARCHAR(255) PRIMARY KEY,
+            messages LONGBLOB NOT NULL,
+            version INT NOT NULL,
+            updated_at DOUBLE NOT NULL,
+            INDEX idx_conversation_state_updated_at (updated_at)
+        )
+    '''),
+    ('shared_cache', '''
+        CREATE TABLE shared_cache(
+            cache_key CHAR(40) PRIMARY KEY,
+            value MEDIUMBLOB NOT NULL,
+            expires_at DOUBLE NOT NULL,
+            INDEX idx_shared_cache_expires_at (expires_at)
+        )
+    '''),
+]
+
+# Generated columns used for case-insensitive name lookups
+COLUMNS = [
+    ('location', 'name_normalized',
+     "ALTER TABLE location ADD COLUMN name_normalized VARCHAR(255) AS (LOWER(TRIM(name))) STORED"),
+    ('search_history', 'location_normalized',
+     "ALTER TABLE search_history ADD COLUMN location_normalized VARCHAR(255) AS (LOWER(TRIM(location))) STORED"),
+]
+
+# Secondary indexes backing every chatbot tool query
+INDEXES = [
+    ('location', 'idx_location_name_normalized', '(name_normalized)'),
+    ('location', 'idx_location_coordinates', '(latitude, longitude)'),
+    ('weather_data', 'idx_weather_data_location_updated', '(location_id, updatedAt)'),
+    ('hourly_data', 'idx_hourly_data_location_time', '(location_id, time)'),
+    ('daily_data', 'idx_daily_data_location_time', '(location_id, time)'),
+    ('search_history', 'idx_search_history_location', '(location_normalized, searched_at, lat, lon)'),
+]
+
+def table_exists(cursor, table: str) -> bool:
+    """Check whether a table exists in the current database"""
+    cursor.execute('''
+        SELECT 1 FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    ''', (table,))
+    return cursor.fetchone() is not None
+
+def column_exists(cursor, table: str, column: str) -> bool:
+    """Check whether a column exists in the current database"""
+    cursor.execute('''
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    ''', (table, column))
+    return cursor.fetchone() is not None
+
+def index_exists(cursor, table: str, index: str) -> bool:
+    """Check whether an index exists in the current database"""
+    cursor.execute('''
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    ''', (table, index))
+    return cursor.fetchone() is not None
+
+def migrate_database():
+    """Add missing tables, columns and indexes to an existing weather database"""
+    connection = None
+    try:
+        connection = mysql.connector.connect(**DB_CONFIG)
+        cursor = connection.cursor(buffered=True)
+
+        for table, statement in TABLES:
+            if table_exists(cursor, table):
+                print(f"Table {table} already exists")
+                continue
+            cursor.execute(statement)
+            print(f"Created table {table}")
+
+        # Global ingestion generation counter
+        cursor.execute("INSERT IGNORE INTO data_generation (location_id, generation) VALUES (0, 0)")
+        connection.commit()
+
+        for table, column, statement in COLUMNS:
+            if column_exists(cursor, table, column):
+                print(f"Column {table}.{column} already exists")
+                continue
+            cursor.execute(statement)
+            print(f"Added column {table}.{column}")
+
+        for table, index, columns in INDEXES:
+            if index_exists(cursor, table, index):
+                print(f"Index {index} already exists")
+                continue
+            cursor.execute(f"CREATE INDEX {index} ON {table} {columns}")
+            print(f"Created index {index} on {table}")
+
+        print("Database migration completed successfully!")
+
+    except Error as e:
+        print(f"Error: {e}")
+
+    finally:
+        if connection and connection.is_connected():
+            cursor.close()
+            connection.close()
+            print("MySQL connection is closed")
+
+if __name__ == "__main__":
+    migrate_database()
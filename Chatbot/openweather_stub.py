@@ -0,0 +1,247 @@
+import os
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Payloads replayed for each endpoint; recorded files override the synthetic ones
+FIXTURE_FILES = {
+    '/data/2.5/weather': 'weather.json',
+    '/data/2.5/forecast': 'forecast.json',
+    '/data/3.0/onecall': 'onecall.json',
+    '/geo/1.0/direct': 'geocode.json',
+}
+
+def coordinates_for(name: str) -> tuple[float, float]:
+    """Stable fake coordinates for a place name"""
+    digest = hashlib.sha1(name.encode('utf-8')).digest()
+    return (int.from_bytes(digest[:4], 'big') / 2**32 * 160 - 80,
+            int.from_bytes(digest[4:8], 'big') / 2**32 * 360 - 180)
+
+def synthetic_weather(lat: float, lon: float) -> dict:
+    """Current weather payload shaped like /data/2.5/weather"""
+    now = int(time.time())
+    return {
+        'coord': {'lat': lat, 'lon': lon},
+        'weather': [{'id': 803, 'main': 'Clouds', 'description': 'broken clouds', 'icon': '04d'}],
+        'main': {'temp': 29.4, 'feels_like': 33.1, 'temp_min': 28.2, 'temp_max': 30.6,
+                 'pressure': 1008, 'humidity': 74},
+        'visibility': 10000,
+        'wind': {'speed': 3.6, 'deg': 140, 'gust': 5.2},
+        'clouds': {'all': 75},
+        'dt': now,
+        'sys': {'sunrise': now - 6 * 3600, 'sunset': now + 6 * 3600},
+        'timezone': 25200,
+        'name': 'Stub',
+        'cod': 200,
+    }
+
+def synthetic_forecast(lat: float, lon: float) -> dict:
+    """Five-day, three-hour forecast payload shaped like /data/2.5/forecast"""
+    start = int(time.time()) // 10800 * 10800 + 10800
+    items = [{
+        'dt': start + i * 10800,
+        'main': {'temp': 27 + i % 8, 'feels_like': 30 + i % 8, 'temp_min': 26 + i % 8, 'temp_max': 28 + i % 8,
+                 'pressure': 1008, 'humidity': 60 + i % 30},
+        'weather': [{'id': 500, 'main': 'Rain', 'description': 'light rain', 'icon': '10d'}],
+        'clouds': {'all': 80},
+        'wind': {'speed': 3.1, 'deg': 150},
+        'dt_txt': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + i * 10800)),
+    } for i in range(40)]
+    return {'cod': '200', 'cnt': len(items), 'list': items, 'city': {'coord': {'lat': lat, 'lon': lon}}}
+
+def synthetic_onecall(lat: float, lon: float) -> dict:
+    """Current, 48-hour and 8-day payload shaped like /data/3.0/onecall"""
+    now = int(time.time())
+    hour = now // 3600 * 3600
+    day = now // 86400 * 86400 + 43200
+    clouds = [{'id': 803, 'main': 'Clouds', 'description': 'broken clouds', 'icon': '04d'}]
+    rain = [{'id': 500, 'main': 'Rain', 'description': 'light rain', 'icon': '10d'}]
+    return {
+        'lat': lat, 'lon': lon, 'timezone': 'Asia/Ho_Chi_Minh', 'timezone_offset': 25200,
+        'current': {'dt': now, 'sunrise': now - 6 * 3600, 'sunset': now + 6 * 3600, 'temp': 29.4, 'feels_like': 33.1,
+                    'pressure': 1008, 'humidity': 74, 'clouds': 75, 'visibility': 10000,
+                    'wind_speed': 3.6, 'wind_deg': 140, 'wind_gust': 5.2, 'weather': clouds},
+        'hourly': [{'dt': hour + i * 3600, 'temp': 27 + i % 8, 'feels_like': 30 + i % 8, 'pressure': 1008,
+                    'humidity': 60 + i % 30, 'clouds': 80, 'wind_speed': 3.1, 'wind_deg': 150, 'weather': rain}
+                   for i in range(48)],
+        'daily': [{'dt': day + i * 86400, 'temp': {'day': 30, 'min': 25 + i % 3, 'max': 32 + i % 3, 'night': 26},
+                   'pressure': 1008, 'humidity': 70, 'clouds': 60, 'wind_speed': 3.4, 'wind_deg': 145, 'weather': rain}
+                  for i in range(8)],
+    }
+
+def synthetic_geocode(name: str) -> list:
+    """Geocoding payload shaped like /geo/1.0/direct"""
+    lat, lon = coordinates_for(name)
+    return [{'name': name, 'lat': lat, 'lon': lon, 'country': 'VN'}]
+
+class StubSettings:
+    """Behaviour of the stub server, shared by every request thread"""
+
+    def __init__(self, latency: float = 0, jitter: float = 0, throttle_rate: float = 0,
+                 quota_per_minute: int = 0, retry_after: int = 1, fixtures_dir: str | None = None,
+                 onecall: bool = True):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.quota_per_minute = quota_per_minute
+        self.retry_after = retry_after
+        # Without it /data/3.0/onecall answers 401, like a key without a One Call subscription
+        self.onecall = onecall
+        self.fixtures = {}
+        if fixtures_dir:
+            for path, filename in FIXTURE_FILES.items():
+                fixture = os.path.join(fixtures_dir, filename)
+                if os.path.exists(fixture):
+                    with open(fixture, 'rb') as f:
+                        self.fixtures[path] = f.read()
+        self._calls: deque[float] = deque()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+
+    def count_request(self):
+        """Count every call received, including the ones rejected before the quota check"""
+        with self._lock:
+            self.requests += 1
+
+    def should_throttle(self) -> bool:
+        """Decide whether this call gets a 429, like a plan quota or a random upstream limit"""
+        with self._lock:
+            now = time.monotonic()
+            throttled = random.random() < self.throttle_rate
+            if self.quota_per_minute and not throttled:
+                while self._calls and self._calls[0] <= now - 60:
+                    self._calls.popleft()
+                throttled = len(self._calls) >= self.quota_per_minute
+                if not throttled:
+                    self._calls.append(now)
+            if throttled:
+                self.throttled += 1
+            return throttled
+
+class OpenWeatherStubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients reuse connections the way they would against the real API
+    protocol_version = 'HTTP/1.1'
+    settings: StubSettings = StubSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, headers: dict | None = None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        settings = self.settings
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        settings.count_request()
+
+        delay = settings.latency + random.uniform(0, settings.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if url.path not in FIXTURE_FILES:
+            self._send(404, b'{"cod": "404", "message": "Internal error"}')
+            return
+        if 'appid' not in query:
+            self._send(401, b'{"cod": 401, "message": "Invalid API key."}')
+            return
+        if url.path == '/data/3.0/onecall' and not settings.onecall:
+            self._send(401, b'{"cod": 401, "message": "Please note that using One Call 3.0 requires a separate subscription"}')
+            return
+        if settings.should_throttle():
+            self._send(429, b'{"cod": 429, "message": "Your account is temporary blocked due to exceeding of requests limitation"}',
+                       {'Retry-After': str(settings.retry_after)})
+            return
+
+        if url.path in settings.fixtures:
+            self._send(200, settings.fixtures[url.path])
+            return
+        if url.path == '/geo/1.0/direct':
+            payload = synthetic_geocode(query.get('q', ''))
+        else:
+            lat, lon = float(query.get('lat', 0)), float(query.get('lon', 0))
+            synthetic = {'/data/2.5/weather': synthetic_weather, '/data/2.5/forecast': synthetic_forecast,
+                         '/data/3.0/onecall': synthetic_onecall}
+            payload = synthetic[url.path](lat, lon)
+        self._send(200, json.dumps(payload).encode('utf-8'))
+
+def start_stub_server(settings: StubSettings, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """Serve the stub API on a background thread; port 0 picks a free port"""
+    handler = type('ConfiguredStubHandler', (OpenWeatherStubHandler,), {'settings': settings})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='openweather-stub', daemon=True).start()
+    return server
+
+def record_fixtures(api_key: str, city: str, fixtures_dir: str):
+    """Save real API responses for one city so the stub can replay them"""
+    import httpx
+    from config import OPENWEATHER_BASE_URL
+
+    os.makedirs(fixtures_dir, exist_ok=True)
+    with httpx.Client(base_url=OPENWEATHER_BASE_URL, timeout=30.0) as client:
+        geocode = client.get('/geo/1.0/direct', params={'q': city, 'limit': 1, 'appid': api_key})
+        geocode.raise_for_status()
+        if not geocode.json():
+            print(f"Could not find coordinates for {city}")
+            return
+        params = {'lat': geocode.json()[0]['lat'], 'lon': geocode.json()[0]['lon'], 'appid': api_key, 'units': 'metric'}
+        responses = {'/geo/1.0/direct': geocode,
+                     '/data/2.5/weather': client.get('/data/2.5/weather', params=params),
+                     '/data/2.5/forecast': client.get('/data/2.5/forecast', params=params)}
+        onecall = client.get('/data/3.0/onecall', params={**params, 'exclude': 'minutely,alerts'})
+    # One Call needs its own subscription; without it the stub keeps the synthetic payload
+    if onecall.is_success:
+        responses['/data/3.0/onecall'] = onecall
+    else:
+        print(f"Skipping onecall.json: One Call answered {onecall.status_code}")
+    for path, response in responses.items():
+        response.raise_for_status()
+        with open(os.path.join(fixtures_dir, FIXTURE_FILES[path]), 'wb') as f:
+            f.write(response.content)
+    print(f"Recorded fixtures for {city} in {fixtures_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenWeather API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0, help="fixed delay added to every response, ms")
+    parser.add_argument('--jitter', type=float, default=0, help="random extra delay of up to this many ms")
+    parser.add_argument('--throttle-rate', type=float, default=0, help="fraction of calls answered with 429")
+    parser.add_argument('--quota-per-minute', type=int, default=0,
+                        help="answer 429 once this many calls were served in the last minute (0 = unlimited)")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument('--fixtures',
+                        help="directory with recorded weather.json, forecast.json, onecall.json and geocode.json")
+    parser.add_argument('--no-onecall', dest='onecall', action='store_false',
+                        help="answer /data/3.0/onecall with 401, like a plan without One Call")
+    parser.add_argument('--record', metavar='CITY',
+                        help="record real responses for CITY into --fixtures using OPENWEATHER_API_KEY and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        from dotenv import load_dotenv
+        load_dotenv()
+        record_fixtures(os.getenv('OPENWEATHER_API_KEY'), args.record, args.fixtures or 'fixtures')
+    else:
+        settings = StubSettings(args.latency / 1000, args.jitter / 1000, args.throttle_rate,
+                                args.quota_per_minute, args.retry_after, args.fixtures, args.onecall)
+        server = start_stub_server(settings, args.host, args.port)
+        print(f"OpenWeather stub listening on http://{args.host}:{server.server_address[1]}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """Async token bucket that spaces out API calls to a fixed rate"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        # rate is in tokens per second; capacity bounds the allowed burst
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, calls_per_minute: int, capacity: float = 1.0) -> "TokenBucket":
+        """Build a bucket from a calls-per-minute plan quota"""
+        return cls(calls_per_minute / 60.0, capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, tokens: float) -> float:
+        """Consume tokens if available, otherwise return how long to wait"""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until enough tokens are available and consume them"""
+        # Waiters queue on the lock, so calls are released in FIFO order
+        async with self._lock:
+            while (delay := self._reserve(tokens)) > 0:
+                await asyncio.sleep(delay)
+
+class AdaptiveRateLimiter(TokenBucket):
+    """Token bucket that backs off when the API answers 429 and creeps back up on success"""
+
+    def __init__(self, rate: float, capacity: float = 1.0, min_rate: float | None = None, recovery: float = 0.05):
+        super().__init__(rate, capacity)
+        self.max_rate = rate
+        self.min_rate = min_rate or rate / 20
+        # Fraction of the plan rate regained per successful call
+        self.recovery = recovery
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+    def _reserve(self, tokens: float) -> float:
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+        return super()._reserve(tokens)
+
+    def throttled(self, retry_after: float | None = None):
+        """The API rejected a call for exceeding the quota: halve the rate and honour Retry-After"""
+        now = time.monotonic()
+        # Concurrent calls rejected together count as one signal
+        if now - self._last_decrease >= max(1.0, 1 / self.rate):
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._last_decrease = now
+        # Calls already spaced under the old rate must not burst through
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+    def succeeded(self):
+        """A call went through: recover towards the plan rate"""
+        self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
@@ -0,0 +1,103 @@
+import time
+from datetime import datetime
+
+from config import (
+    REFRESH_HOT_INTERVAL, REFRESH_WARM_INTERVAL, REFRESH_COLD_INTERVAL, REFRESH_HOT_DEMAND, REFRESH_WARM_DEMAND,
+    DEMAND_HALF_LIFE,
+)
+
+# location_refresh row 0 is not a location; its last_fetched_at marks how far search_history was read
+SEARCH_CURSOR_ID = 0
+
+# Adds request counts to a location's demand, decaying what was there by the time since the last update.
+# executemany batches INSERTs from the VALUES placeholders only, so the half-life is inlined as a literal
+RECORD_DEMAND_SQL = f'''
+    INSERT INTO location_refresh (location_id, demand, demand_updated_at) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        demand = demand * POW(0.5, GREATEST(VALUES(demand_updated_at) - demand_updated_at, 0) / {float(DEMAND_HALF_LIFE)!r})
+                 + VALUES(demand),
+        demand_updated_at = GREATEST(demand_updated_at, VALUES(demand_updated_at))
+'''
+
+# Location rows with their current demand; DUE_FILTER_SQL keeps the ones never fetched,
+# past their due time, or gone hot since they were scheduled
+LOCATION_DEMAND_SQL = '''
+    SELECT l.id, l.name, l.latitude, l.longitude, r.last_fetched_at, r.next_due_at,
+           COALESCE(r.demand * POW(0.5, GREATEST(%s - r.demand_updated_at, 0) / %s), 0) AS demand
+    FROM location l
+    LEFT JOIN location_refresh r ON r.location_id = l.id
+'''
+DUE_FILTER_SQL = " HAVING last_fetched_at IS NULL OR next_due_at <= %s OR (demand >= %s AND last_fetched_at <= %s)"
+DUE_ORDER_SQL = " ORDER BY last_fetched_at IS NULL DESC, demand DESC, next_due_at"
+
+def refresh_interval(demand: float) -> float:
+    """Seconds until a location with this demand should be refreshed again"""
+    if demand >= REFRESH_HOT_DEMAND:
+        return REFRESH_HOT_INTERVAL
+    if demand >= REFRESH_WARM_DEMAND:
+        return REFRESH_WARM_INTERVAL
+    return REFRESH_COLD_INTERVAL
+
+def due_at(location: dict) -> float:
+    """When a location row from due_locations should next be refreshed (0 = now)"""
+    if location.get('last_fetched_at') is None:
+        return 0.0
+    due = location['next_due_at'] or 0.0
+    # Locations that turned hot since they were scheduled are pulled forward
+    if location['demand'] >= REFRESH_HOT_DEMAND:
+        due = min(due, location['last_fetched_at'] + REFRESH_HOT_INTERVAL)
+    return due
+
+def demand_rows(hits: dict[int, float], now: float) -> list[tuple]:
+    """Parameters of RECORD_DEMAND_SQL for a batch of request counts"""
+    return [(location_id, count, now) for location_id, count in hits.items()]
+
+def record_demand(cursor, hits: dict[int, float], now: float | None = None):
+    """Add request counts per location to their demand"""
+    if hits:
+        cursor.executemany(RECORD_DEMAND_SQL, demand_rows(hits, now or time.time()))
+
+def collect_search_demand(cursor, now: float | None = None) -> int:
+    """Fold app searches made since the last call into location demand"""
+    now = now or time.time()
+    cursor.execute("SELECT last_fetched_at FROM location_refresh WHERE location_id = %s", (SEARCH_CURSOR_ID,))
+    row = cursor.fetchone()
+    # searched_at is an ISO-8601 string, so it compares correctly as text
+    since = datetime.fromtimestamp(row[0] if row and row[0] else now - DEMAND_HALF_LIFE).isoformat()
+    until = datetime.fromtimestamp(now).isoformat()
+    cursor.execute('''
+        SELECT l.id, COUNT(*)
+        FROM search_history s
+        JOIN location l ON l.name_normalized = s.location_normalized
+        WHERE s.searched_at > %s AND s.searched_at <= %s
+        GROUP BY l.id
+    ''', (since, until))
+    hits = dict(cursor.fetchall())
+    record_demand(cursor, hits, now)
+    cursor.execute('''
+        INSERT INTO location_refresh (location_id, last_fetched_at) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE last_fetched_at = VALUES(last_fetched_at)
+    ''', (SEARCH_CURSOR_ID, now))
+    return sum(hits.values())
+
+def due_locations(cursor, now: float | None = None, limit: int | None = None, everything: bool = False) -> list[dict]:
+    """Locations that need a refresh (or all of them), never-fetched and most requested first"""
+    now = now or time.time()
+    sql, params = LOCATION_DEMAND_SQL, [now, DEMAND_HALF_LIFE]
+    if not everything:
+        sql += DUE_FILTER_SQL
+        params += [now, REFRESH_HOT_DEMAND, now - REFRESH_HOT_INTERVAL]
+    sql += DUE_ORDER_SQL + (f" LIMIT {int(limit)}" if limit else '')
+    cursor.execute(sql, params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def mark_refreshed(cursor, demands: dict[int, float], now: float | None = None):
+    """Record a successful refresh and schedule the next one from each location's demand"""
+    if not demands:
+        return
+    now = now or time.time()
+    cursor.executemany('''
+        INSERT INTO location_refresh (location_id, last_fetched_at, next_due_at) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE last_fetched_at = VALUES(last_fetched_at), next_due_at = VALUES(next_due_at)
+    ''', [(location_id, now, now + refresh_interval(demand)) for location_id, demand in demands.items()])
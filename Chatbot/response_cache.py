@@ -0,0 +1,92 @@
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# Filler words that do not change what is asked; negations, comparisons and weather words are kept
+STOPWORDS = {
+    # Vietnamese
+    'à', 'ạ', 'ơi', 'nhé', 'nhỉ', 'nha', 'vậy', 'hả', 'cho', 'tôi', 'mình', 'bạn', 'xin', 'hỏi', 'biết',
+    'giúp', 'với', 'là', 'thì', 'ở', 'tại', 'của',
+    # English
+    'a', 'an', 'the', 'please', 'me', 'i', 'my', 'you', 'can', 'could', 'tell', 'know', 'in', 'at', 'for',
+    'of', 'to', 'about', 'is', 'are', 'will', 'it', 'be', 'there', 'do', 'does',
+}
+
+def normalize_question(text: str) -> str:
+    """Lower-case and strip punctuation from a question, keeping its accents"""
+    # Folding would merge different Vietnamese words ("ô" umbrella and "áo" jacket both lose their marks)
+    return ' '.join(re.sub(r'[\W_]+', ' ', unicodedata.normalize('NFC', text).lower()).split())
+
+def question_key(question: str) -> str:
+    """Content words of a question in order; questions only share an answer if these are identical"""
+    return ' '.join(word for word in normalize_question(question).split() if word not in STOPWORDS)
+
+@dataclass
+class CachedResponse:
+    tokens: list[str]
+    expires_at: float
+
+class ResponseCache:
+    """Model answers keyed by question content words, language and the data generation of every place asked about"""
+
+    def __init__(self, maxsize: int, ttl: float, shared=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key = (places, language, question_key), places = ((location_id, generation), ...)
+        self._entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+        # Optional SharedStore so answers computed by one worker are replayed by the others
+        self.shared = shared
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, question: str, places: tuple[tuple[int, int], ...], language: str) -> tuple:
+        return tuple(sorted(places)), language, question_key(question)
+
+    def get(self, question: str, places: tuple[tuple[int, int], ...], language: str) -> list[str] | None:
+        """Return the cached token stream for the same question about the same data"""
+        key = self._key(question, places, language)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry.tokens
+
+    def put(self, question: str, places: tuple[tuple[int, int], ...], language: str, tokens: list[str]):
+        """Remember the token stream the model produced for a question"""
+        key = self._key(question, places, language)
+        # Entries of older generations are never hit again and age out of the LRU
+        self._entries[key] = CachedResponse(tokens, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _shared_key(self, question: str, places: tuple[tuple[int, int], ...], language: str) -> str:
+        places, language, content = self._key(question, places, language)
+        return f"response:{','.join(f'{location_id}@{generation}' for location_id, generation in places)}:{language}:{content}"
+
+    async def lookup(self, question: str, places: tuple[tuple[int, int], ...], language: str) -> list[str] | None:
+        """Check this worker first, then the shared store"""
+        tokens = self.get(question, places, language)
+        if tokens is not None or self.shared is None:
+            return tokens
+        value = await self.shared.get(self._shared_key(question, places, language))
+        if value is None:
+            return None
+        tokens = json.loads(value)
+        self.put(question, places, language, tokens)
+        return tokens
+
+    async def store(self, question: str, places: tuple[tuple[int, int], ...], language: str, tokens: list[str]):
+        """Remember an answer in this worker and in the shared store"""
+        self.put(question, places, language, tokens)
+        if self.shared is not None:
+            await self.shared.set(
+                self._shared_key(question, places, language), json.dumps(tokens).encode('utf-8'), self.ttl
+            )
@@ -0,0 +1,133 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from background import BlockingIO, PeriodicTask
+
+def hash_key(key: str) -> str:
+    """Fixed-length storage key, so arbitrary cache keys fit an indexed column"""
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+class SharedStore(ABC):
+    """Key/value store with expiry shared by every chatbot worker"""
+
+    def __init__(self, io_threads: int = 4):
+        # Implementations block, so calls run on a small dedicated thread pool
+        self._io = BlockingIO(io_threads, 'shared-store')
+        self._purger = PeriodicTask(self.purge_expired, 600, 'purging shared store', delay_first=True)
+
+    async def get(self, key: str) -> bytes | None:
+        """Return the value stored under key, or None if missing or expired"""
+        return await self._io.run(self._get, hash_key(key))
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        """Store a value for ttl seconds"""
+        await self._io.run(self._set, hash_key(key), value, time.time() + ttl)
+
+    async def purge_expired(self) -> int:
+        """Delete expired entries"""
+        return await self._io.run(self._purge_expired)
+
+    def start(self, purge_interval: float = 600):
+        """Purge expired entries in the background"""
+        self._purger.interval = purge_interval
+        self._purger.start()
+
+    async def stop(self):
+        """Stop the background purge"""
+        await self._purger.stop()
+
+    def close(self):
+        self._io.shutdown()
+
+    @abstractmethod
+    def _get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, value: bytes, expires_at: float):
+        ...
+
+    @abstractmethod
+    def _purge_expired(self) -> int:
+        ...
+
+class SqliteSharedStore(SharedStore):
+    """Shared store in a local SQLite file; covers several workers on one host and tests"""
+
+    def __init__(self, path: str, io_threads: int = 4):
+        super().__init__(io_threads)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS shared_cache(
+                cache_key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_shared_cache_expires_at ON shared_cache(expires_at)")
+        self._connection.commit()
+
+    def _get(self, key: str) -> bytes | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM shared_cache WHERE cache_key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: bytes, expires_at: float):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO shared_cache (cache_key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+            self._connection.commit()
+
+    def _purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._connection.execute("DELETE FROM shared_cache WHERE expires_at <= ?", (time.time(),))
+            self._connection.commit()
+        return cursor.rowcount
+
+    def close(self):
+        super().close()
+        with self._lock:
+            self._connection.close()
+
+class MySQLSharedStore(SharedStore):
+    """Shared store in the weather database; covers workers spread over several hosts"""
+
+    def __init__(self, pool, io_threads: int = 4):
+        super().__init__(io_threads)
+        self.pool = pool
+
+    def _execute(self, statement: str, params: tuple, fetch: bool = False):
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(statement, params)
+            result = cursor.fetchone() if fetch else cursor.rowcount
+            cursor.close()
+            return result
+        finally:
+            connection.close()
+
+    def _get(self, key: str) -> bytes | None:
+        row = self._execute(
+            "SELECT value FROM shared_cache WHERE cache_key = %s AND expires_at > %s", (key, time.time()), fetch=True
+        )
+        return bytes(row[0]) if row else None
+
+    def _set(self, key: str, value: bytes, expires_at: float):
+        self._execute('''
+            INSERT INTO shared_cache (cache_key, value, expires_at) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE value = VALUES(value), expires_at = VALUES(expires_at)
+        ''', (key, value, expires_at))
+
+    def _purge_expired(self) -> int:
+        return self._execute("DELETE FROM shared_cache WHERE expires_at <= %s", (time.time(),))
@@ -0,0 +1,63 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> tuple[float, float, float, float]:
+    """Return (min_lat, max_lat, min_lon, max_lon) enclosing a circle around the point"""
+    lat_delta = radius_km / KM_PER_DEGREE
+    lon_delta = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return latitude - lat_delta, latitude + lat_delta, longitude - lon_delta, longitude + lon_delta
+
+class SpatialIndex:
+    """Uniform lat/lon grid for nearest-location lookups"""
+
+    def __init__(self, cell_size: float = 0.5):
+        # cell_size is in degrees; lookups only scan the cells overlapping the search radius
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], dict[int, tuple[float, float]]] = {}
+        self._positions: dict[int, tuple[float, float]] = {}
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def insert(self, location_id: int, latitude: float, longitude: float):
+        """Add or move a location"""
+        self.remove(location_id)
+        self._positions[location_id] = (latitude, longitude)
+        self._cells.setdefault(self._cell(latitude, longitude), {})[location_id] = (latitude, longitude)
+
+    def remove(self, location_id: int):
+        """Forget a location"""
+        position = self._positions.pop(location_id, None)
+        if position is not None:
+            cell = self._cell(*position)
+            self._cells[cell].pop(location_id, None)
+            if not self._cells[cell]:
+                del self._cells[cell]
+
+    def nearest(self, latitude: float, longitude: float, radius_km: float) -> tuple[int, float] | None:
+        """Return (location_id, distance_km) of the closest location within radius_km"""
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+        min_row, min_col = self._cell(min_lat, min_lon)
+        max_row, max_col = self._cell(max_lat, max_lon)
+
+        best = None
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                for location_id, (lat, lon) in self._cells.get((row, col), {}).items():
+                    distance = haversine_km(latitude, longitude, lat, lon)
+                    if distance <= radius_km and (best is None or distance < best[1]):
+                        best = (location_id, distance)
+        return best
@@ -0,0 +1,41 @@
+import pytest
+
+from gazetteer import Gazetteer, Place
+from response_cache import ResponseCache
+
+HANOI = (1, 7)
+
+def cache_with(question: str, places=(HANOI,), language: str = 'en') -> ResponseCache:
+    cache = ResponseCache(maxsize=100, ttl=60)
+    cache.put(question, places, language, ['cached answer'])
+    return cache
+
+@pytest.mark.parametrize('asked, other', [
+    ("I am planning a picnic in Hanoi this weekend, will it be too hot for the kids?",
+     "I am planning a picnic in Hanoi this weekend, will it be too cold for the kids?"),
+    ("Tối nay ở Hà Nội trời có lạnh không, tôi có cần mang áo khoác không?",
+     "Tối nay ở Hà Nội trời có nóng không, tôi có cần mang áo khoác không?"),
+    ("Is it warmer in Hanoi than in Saigon right now?",
+     "Is it warmer in Hanoi than in Hue right now?"),
+    ("Có nên mang ô ở Hà Nội không?",
+     "Có nên mang áo ở Hà Nội không?"),
+])
+def test_questions_asking_different_things_do_not_share_an_answer(asked, other):
+    assert cache_with(asked).get(other, (HANOI,), 'en') is None
+
+def test_rewording_with_filler_words_shares_an_answer():
+    cache = cache_with("Có nên mang ô ở Hà Nội không?", language='vi')
+    assert cache.get("Cho tôi hỏi có nên mang ô ở Hà Nội không ạ", (HANOI,), 'vi') == ['cached answer']
+
+def test_refreshing_any_place_in_the_question_invalidates_the_answer():
+    question = "Is it warmer in Hanoi than in Saigon right now?"
+    cache = cache_with(question, places=(HANOI, (2, 3)))
+    assert cache.get(question, (HANOI, (2, 3)), 'en') == ['cached answer']
+    assert cache.get(question, (HANOI, (2, 4)), 'en') is None
+
+def test_places_in_text_finds_every_place():
+    gazetteer = Gazetteer(refresh_interval=60)
+    gazetteer.add(Place('Hà Nội', 21.03, 105.85, 1))
+    gazetteer.add(Place('Ho Chi Minh City', 10.82, 106.63, 2))
+    places = gazetteer.places_in_text("Is it warmer in Hanoi than in Saigon right now?")
+    assert [place.location_id for place in places] == [1, 2]
@@ -0,0 +1,90 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+class AsyncTTLCache:
+    """Size-bounded LRU cache with per-entry TTL and single-flight loading"""
+
+    def __init__(self, maxsize: int, ttl: float, group_of: Callable[[Hashable], Hashable] | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        # Keys indexed by group (e.g. location id), so a group is dropped without scanning the cache
+        self.group_of = group_of
+        self._groups: dict[Hashable, set[Hashable]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        """Return a fresh cached value or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries if full"""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        if self.group_of is not None:
+            self._groups.setdefault(self.group_of(key), set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: Hashable):
+        self._entries.pop(key, None)
+        if self.group_of is not None:
+            group = self._groups.get(self.group_of(key))
+            if group is not None:
+                group.discard(key)
+                if not group:
+                    del self._groups[self.group_of(key)]
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        """Return the cached value, or run loader once for all concurrent callers of the same key"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish_load(key, done))
+        # Shield so one cancelled caller does not cancel the load for everyone else
+        return await asyncio.shield(task)
+
+    def _finish_load(self, key: Hashable, task: asyncio.Task):
+        # A load that was invalidated while running may hold stale data, so it is not stored
+        if self._inflight.get(key) is not task:
+            return
+        del self._inflight[key]
+        # Failed or empty loads are not cached so the next call retries
+        if not task.cancelled() and task.exception() is None and task.result() is not None:
+            self.set(key, task.result())
+
+    def invalidate(self, key: Hashable):
+        """Drop one entry"""
+        self._drop(key)
+        self._inflight.pop(key, None)
+
+    def invalidate_group(self, group: Hashable):
+        """Drop every entry of a group, and forget its in-flight loads so their results are not stored"""
+        for key in self._groups.pop(group, ()):
+            self._entries.pop(key, None)
+        # Only a handful of loads run at once, so scanning them is cheap
+        for key in [key for key in self._inflight if self.group_of(key) == group]:
+            del self._inflight[key]
+
+    def clear(self):
+        """Drop all entries"""
+        self._entries.clear()
+        self._groups.clear()
@@ -0,0 +1,27 @@
+from typing import Any
+
+def round_value(value: Any, ndigits: int) -> Any:
+    """Round floats; leave other values untouched"""
+    if isinstance(value, float):
+        rounded = round(value, ndigits)
+        return int(rounded) if rounded.is_integer() else rounded
+    return value
+
+def compact_record(record: dict, ndigits: int = 1, fields: list[str] | None = None) -> dict:
+    """Round numbers and keep only the requested fields of a single record"""
+    keys = [key for key in record if not fields or key in fields]
+    return {key: round_value(record[key], ndigits) for key in keys}
+
+def to_table(rows: list[dict], ndigits: int = 1, fields: list[str] | None = None) -> dict:
+    """Encode a list of records column-wise so repeated keys are sent to the model only once"""
+    if not rows:
+        return {'columns': [], 'rows': []}
+    columns = [key for key in rows[0] if not fields or key in fields or key == 'time']
+    return {
+        'columns': columns,
+        'rows': [[round_value(row[key], ndigits) for key in columns] for row in rows],
+    }
+
+def join_lists(values: dict[str, list[str]]) -> dict[str, str]:
+    """Turn lists of phrases into comma-separated strings, dropping empty ones"""
+    return {key: ', '.join(items) for key, items in values.items() if items}
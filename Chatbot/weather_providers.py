@@ -0,0 +1,114 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+import httpx
+
+@dataclass
+class WeatherBundle:
+    """Weather of one location normalized to the /data/2.5 shapes the row builders read"""
+    # /data/2.5/weather payload
+    current: dict | None = None
+    # /data/2.5/forecast list items, used for hourly rows (and daily rows when daily is None)
+    forecast: list | None = None
+    # One item per day in the same shape, when the provider reports daily min/max directly
+    daily: list | None = None
+
+class WeatherProvider(ABC):
+    """Turns one location refresh into API calls and their responses into a WeatherBundle"""
+    name = ''
+
+    @abstractmethod
+    def requests(self, latitude: float, longitude: float, api_key: str) -> list[tuple[str, dict]]:
+        """(path, params) of every GET needed for one location"""
+
+    @abstractmethod
+    def normalize(self, payloads: list) -> WeatherBundle:
+        """Build a bundle from the responses, in request order; failed calls are None"""
+
+class StandardProvider(WeatherProvider):
+    """Current weather and 5-day/3-hour forecast from two /data/2.5 calls, available on every plan"""
+    name = 'standard'
+
+    def requests(self, latitude, longitude, api_key):
+        params = {'lat': latitude, 'lon': longitude, 'appid': api_key, 'units': 'metric'}
+        return [("/data/2.5/weather", params), ("/data/2.5/forecast", params)]
+
+    def normalize(self, payloads):
+        weather_data, forecast_data = payloads
+        return WeatherBundle(current=weather_data, forecast=forecast_data['list'] if forecast_data else None)
+
+def onecall_item(item: dict, temp_max: float, temp_min: float) -> dict:
+    """Convert a One Call hourly/daily entry into a /data/2.5/forecast list item"""
+    return {
+        'dt': item['dt'],
+        'main': {'temp_max': temp_max, 'temp_min': temp_min, 'humidity': item['humidity']},
+        'weather': item['weather'],
+    }
+
+class OneCallProvider(WeatherProvider):
+    """Current, hourly and daily weather from a single /data/3.0/onecall call (needs a One Call plan)"""
+    name = 'onecall'
+
+    def requests(self, latitude, longitude, api_key):
+        return [("/data/3.0/onecall", {
+            'lat': latitude, 'lon': longitude, 'appid': api_key, 'units': 'metric', 'exclude': 'minutely,alerts'
+        })]
+
+    def normalize(self, payloads):
+        payload = payloads[0]
+        if payload is None:
+            return WeatherBundle()
+        current = payload['current']
+        today = payload['daily'][0]['temp'] if payload.get('daily') else {'max': current['temp'], 'min': current['temp']}
+        return WeatherBundle(
+            current={
+                'main': {
+                    'temp': current['temp'],
+                    'feels_like': current['feels_like'],
+                    'temp_max': today['max'],
+                    'temp_min': today['min'],
+                    'pressure': current['pressure'],
+                    'humidity': current['humidity'],
+                },
+                'wind': {'speed': current['wind_speed'], 'deg': current['wind_deg'], 'gust': current.get('wind_gust', 0)},
+                'weather': current['weather'],
+                'timezone': payload['timezone_offset'],
+                'clouds': {'all': current['clouds']},
+                'visibility': current.get('visibility', 10000),
+                'sys': {'sunrise': current.get('sunrise', 0), 'sunset': current.get('sunset', 0)},
+                'dt': current['dt'],
+            },
+            forecast=[onecall_item(item, item['temp'], item['temp']) for item in payload.get('hourly', [])],
+            daily=[onecall_item(item, item['temp']['max'], item['temp']['min']) for item in payload.get('daily', [])],
+        )
+
+class FallbackProvider:
+    """Use the preferred provider until the plan turns out not to include it, then the fallback"""
+
+    def __init__(self, preferred: WeatherProvider, fallback: WeatherProvider):
+        self.active = preferred
+        self.fallback = fallback
+
+    def unsupported(self, provider: WeatherProvider, error: Exception) -> bool:
+        """True if provider failed because the plan does not include its endpoint and there is a fallback"""
+        if provider is self.fallback or not isinstance(error, httpx.HTTPStatusError):
+            return False
+        return error.response.status_code in (401, 403)
+
+    def fall_back(self, provider: WeatherProvider):
+        """Switch to the fallback for good; concurrent refreshes may report the same provider"""
+        if self.active is provider:
+            print(f"{provider.name} endpoint not available on this plan, using {self.fallback.name}")
+            self.active = self.fallback
+
+PROVIDERS = {
+    'standard': StandardProvider,
+    'onecall': OneCallProvider,
+}
+
+def create_provider(name: str) -> FallbackProvider:
+    """Provider selected by OPENWEATHER_PROVIDER; 'auto' tries One Call first"""
+    if name == 'auto':
+        return FallbackProvider(OneCallProvider(), StandardProvider())
+    provider = PROVIDERS[name]()
+    return FallbackProvider(provider, provider)
@@ -0,0 +1,227 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from aiomysql import Error
+
+from db_pool import db_cursor
+from demand_recorder import DemandRecorder
+from gazetteer import Gazetteer, Place
+from spatial_index import bounding_box, haversine_km
+from tool_cache import AsyncTTLCache
+
+# Picks the stored location closest to a point; the bounding box keeps it on idx_location_coordinates
+NEAREST_LOCATION_SQL = '''
+    SELECT id, name, latitude, longitude
+    FROM location
+    WHERE latitude BETWEEN %s AND %s AND longitude BETWEEN %s AND %s
+    ORDER BY POW(latitude - %s, 2) + POW(longitude - %s, 2)
+    LIMIT 1
+'''
+
+CURRENT_WEATHER_COLUMNS = 'w.temperature, w.feelsLike, w.humidity, w.windSpeed, w.description, w.main, w.icon, w.updatedAt'
+FORECAST_COLUMNS = 'f.time, f.temperatureMax, f.temperatureMin, f.humidity, f.icon'
+
+@dataclass
+class ChatDeps:
+    """Per-turn state shared by the agent tools"""
+    # Coordinates already resolved during this turn, so each tool call skips the lookup
+    locations: dict[tuple[float, float], int | None] = field(default_factory=dict)
+    # Set when a tool came back empty (database error, timeout or no data), so the answer is not cached
+    tool_failed: bool = False
+
+def format_current_weather(row: dict) -> dict:
+    """Convert a weather_data row into the tool result format"""
+    return {
+        'temperature': row['temperature'],
+        'feels_like': row['feelsLike'],
+        'humidity': row['humidity'],
+        'wind_speed': row['windSpeed'],
+        'description': row['description'],
+        'main': row['main'],
+        'icon': row['icon'],
+        'updated_at': row['updatedAt']
+    }
+
+def format_forecast(rows: list[dict], time_format: str) -> list[dict]:
+    """Convert hourly_data/daily_data rows into the tool result format"""
+    return [{
+        'time': datetime.fromtimestamp(item['time']).strftime(time_format),
+        'temperature_max': item['temperatureMax'],
+        'temperature_min': item['temperatureMin'],
+        'humidity': item['humidity'],
+        'icon': item['icon']
+    } for item in rows]
+
+# tool name -> (data table, row limit, time format)
+FORECASTS = {
+    'hourly': ('hourly_data', 24, '%H:%M:%S'),
+    'daily': ('daily_data', 7, '%d/%m/%Y'),
+}
+
+class WeatherRepository:
+    """Single entry point for the chatbot's location and weather reads"""
+
+    def __init__(self, gazetteer: Gazetteer, cache: AsyncTTLCache, radius_km: float,
+                 demand: DemandRecorder | None = None):
+        self.gazetteer = gazetteer
+        self.cache = cache
+        self.radius_km = radius_km
+        # Every weather read counts as interest in the location, so the ingester refreshes it sooner
+        self.demand = demand
+
+    def _record_demand(self, location_id: int):
+        if self.demand is not None:
+            self.demand.record(location_id)
+
+    async def find_coordinates(self, name: str) -> tuple[float, float] | None:
+        """Resolve a place name to coordinates, in memory first and then from the database"""
+        # Accent-folded in-memory lookup first; covers "Hanoi", "Ha Noi" and "Hà Nội" alike
+        place = self.gazetteer.lookup(name)
+        if place:
+            return place.latitude, place.longitude
+
+        try:
+            async with db_cursor() as cursor:
+                # First check if location exists in location table (case-insensitive, indexed)
+                await cursor.execute("SELECT latitude, longitude, id FROM location WHERE name_normalized = LOWER(TRIM(%s)) LIMIT 1", (name,))
+                result = await cursor.fetchone()
+                if result and result[0] is not None:
+                    self.gazetteer.add(Place(name, result[0], result[1], result[2]))
+                    return result[0], result[1]
+
+                # If not found in location table, check search_history (case-insensitive)
+                await cursor.execute("SELECT lat, lon FROM search_history WHERE location_normalized = LOWER(TRIM(%s)) ORDER BY searched_at DESC LIMIT 1", (name,))
+                result = await cursor.fetchone()
+                if result:
+                    self.gazetteer.add(Place(name, result[0], result[1]), authoritative=False)
+                    return result
+                return None
+        except Error as e:
+            print(f"Error querying database: {e}")
+            return None
+
+    def resolve_in_memory(self, deps: ChatDeps | None, latitude: float, longitude: float) -> int | None:
+        """Resolve coordinates without touching the database"""
+        if deps is not None and (latitude, longitude) in deps.locations:
+            return deps.locations[(latitude, longitude)]
+        # Coordinates from the model are often rounded, so match within a radius instead of exactly
+        match = self.gazetteer.locations.nearest(latitude, longitude, self.radius_km)
+        location_id = match[0] if match else None
+        if location_id is not None and deps is not None:
+            deps.locations[(latitude, longitude)] = location_id
+        return location_id
+
+    def _remember_location(self, deps: ChatDeps | None, latitude: float, longitude: float, row: dict) -> int | None:
+        """Record the location picked by a joined query, if it is within the match radius"""
+        if haversine_km(latitude, longitude, row['latitude'], row['longitude']) > self.radius_km:
+            return None
+        self.gazetteer.add(Place(row['name'], row['latitude'], row['longitude'], row['location_id']))
+        self._record_demand(row['location_id'])
+        if deps is not None:
+            deps.locations[(latitude, longitude)] = row['location_id']
+        return row['location_id']
+
+    def _nearest_params(self, latitude: float, longitude: float) -> tuple:
+        return (*bounding_box(latitude, longitude, self.radius_km), latitude, longitude)
+
+    async def load_current_weather(self, location_id: int) -> dict | None:
+        """Load the latest current weather row of a location"""
+        try:
+            async with db_cursor(dictionary=True) as cursor:
+                await cursor.execute(f"""
+                    SELECT {CURRENT_WEATHER_COLUMNS}
+                    FROM weather_data w
+                    WHERE w.location_id = %s
+                    ORDER BY w.updatedAt DESC
+                    LIMIT 1
+                """, (location_id,))
+                row = await cursor.fetchone()
+                return format_current_weather(row) if row else None
+        except Error as e:
+            print(f"Error querying database: {e}")
+            return None
+
+    async def load_forecast(self, tool: str, location_id: int) -> list[dict] | None:
+        """Load the upcoming hourly or daily forecast rows of a location"""
+        table, limit, time_format = FORECASTS[tool]
+        try:
+            async with db_cursor(dictionary=True) as cursor:
+                await cursor.execute(f"""
+                    SELECT {FORECAST_COLUMNS}
+                    FROM {table} f
+                    WHERE f.location_id = %s
+                    ORDER BY f.time ASC
+                    LIMIT {limit}
+                """, (location_id,))
+                rows = await cursor.fetchall()
+                return format_forecast(rows, time_format) if rows else None
+        except Error as e:
+            print(f"Error querying database: {e}")
+            return None
+
+    async def _current_weather_near(self, deps: ChatDeps | None, latitude: float, longitude: float) -> dict | None:
+        """Resolve the nearest location and read its current weather in one statement"""
+        try:
+            async with db_cursor(dictionary=True) as cursor:
+                await cursor.execute(f"""
+                    SELECT l.id AS location_id, l.name, l.latitude, l.longitude, {CURRENT_WEATHER_COLUMNS}
+                    FROM ({NEAREST_LOCATION_SQL}) l
+                    JOIN weather_data w ON w.location_id = l.id
+                    ORDER BY w.updatedAt DESC
+                    LIMIT 1
+                """, self._nearest_params(latitude, longitude))
+                row = await cursor.fetchone()
+        except Error as e:
+            print(f"Error querying database: {e}")
+            return None
+        if not row or self._remember_location(deps, latitude, longitude, row) is None:
+            return None
+        weather = format_current_weather(row)
+        self.cache.set(('current', row['location_id']), weather)
+        return weather
+
+    async def _forecast_near(self, tool: str, deps: ChatDeps | None, latitude: float, longitude: float) -> list[dict] | None:
+        """Resolve the nearest location and read its forecast in one statement"""
+        table, limit, time_format = FORECASTS[tool]
+        try:
+            async with db_cursor(dictionary=True) as cursor:
+                await cursor.execute(f"""
+                    SELECT l.id AS location_id, l.name, l.latitude, l.longitude, {FORECAST_COLUMNS}
+                    FROM ({NEAREST_LOCATION_SQL}) l
+                    JOIN {table} f ON f.location_id = l.id
+                    ORDER BY f.time ASC
+                    LIMIT {limit}
+                """, self._nearest_params(latitude, longitude))
+                rows = await cursor.fetchall()
+        except Error as e:
+            print(f"Error querying database: {e}")
+            return None
+        if not rows or self._remember_location(deps, latitude, longitude, rows[0]) is None:
+            return None
+        forecast = format_forecast(rows, time_format)
+        self.cache.set((tool, rows[0]['location_id']), forecast)
+        return forecast
+
+    async def current_weather(self, deps: ChatDeps | None, latitude: float, longitude: float) -> dict | None:
+        """Current weather of the location nearest to the coordinates"""
+        location_id = self.resolve_in_memory(deps, latitude, longitude)
+        if location_id is None:
+            return await self._current_weather_near(deps, latitude, longitude)
+        return await self.current_weather_by_id(location_id)
+
+    async def current_weather_by_id(self, location_id: int) -> dict | None:
+        """Current weather of a known location, through the cache"""
+        self._record_demand(location_id)
+        return await self.cache.get_or_load(('current', location_id), lambda: self.load_current_weather(location_id))
+
+    async def forecast(self, tool: str, deps: ChatDeps | None, latitude: float, longitude: float) -> list[dict] | None:
+        """Hourly or daily forecast of the location nearest to the coordinates"""
+        location_id = self.resolve_in_memory(deps, latitude, longitude)
+        if location_id is None:
+            return await self._forecast_near(tool, deps, latitude, longitude)
+        return await self.forecast_by_id(tool, location_id)
+
+    async def forecast_by_id(self, tool: str, location_id: int) -> list[dict] | None:
+        """Hourly or daily forecast of a known location, through the cache"""
+        self._record_demand(location_id)
+        return await self.cache.get_or_load((tool, location_id), lambda: self.load_forecast(tool, location_id))